@@ -0,0 +1,8 @@
+from dotenv import load_dotenv
+from pathlib import Path
+
+# Load environment variables once for the whole app package, from the
+# project's .env by path so no directory search runs on startup
+ENV_FILE = Path(__file__).resolve().parent.parent / ".env"
+if ENV_FILE.is_file():
+    load_dotenv(ENV_FILE)
@@ -1,37 +1,55 @@
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
+from cachetools import TTLCache
+import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select, lambda_stmt
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 import os
-from dotenv import load_dotenv
+import time
+import asyncio
+import hashlib
 
 from ..schemas.schemas import TokenData
 from ..database.database import get_db
 from ..models.models import User
 
-# Load environment variables
-load_dotenv()
-
 # JWT settings from environment variables
 SECRET_KEY = os.getenv("SECRET_KEY", "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
-# Password context for hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Recently verified tokens, keyed by SHA-256 of the token -> (email, user_id, expires_at)
+JWT_CACHE_TTL_SECONDS = 30
+_jwt_cache = TTLCache(maxsize=10000, ttl=JWT_CACHE_TTL_SECONDS)
+
+# Detached snapshots of authenticated users, keyed by user id
+USER_CACHE_TTL_SECONDS = 60
+_user_cache = TTLCache(maxsize=5000, ttl=USER_CACHE_TTL_SECONDS)
+
+# bcrypt work factor; lower it on small hosts, raise it on fast ones
+BCRYPT_COST = int(os.getenv("BCRYPT_COST", "12"))
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 def verify_password(plain_password, hashed_password):
     """Verify a password against a hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
 
 def get_password_hash(password):
     """Hash a password for storing."""
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_COST)).decode()
+
+def needs_rehash(hashed_password):
+    """Check whether a hash was made with a different cost than BCRYPT_COST."""
+    # bcrypt hashes look like $2b$12$<salt+hash>
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_COST
+    except (IndexError, ValueError):
+        return True
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """Create a JWT access token."""
@@ -49,11 +67,45 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_user_by_email(db: Session, email: str):
+def decode_access_token(token: str):
+    """Decode a JWT access token, reusing a recent verification of the same token."""
+    key = hashlib.sha256(token.encode()).hexdigest()
+    now = time.time()
+    
+    cached = _jwt_cache.get(key)
+    if cached is not None and cached[2] > now:
+        return cached
+    
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    email = payload.get("sub")
+    user_id = payload.get("user_id")
+    exp = payload.get("exp")
+    
+    # Never keep a token around past its own expiry
+    expires_at = now + JWT_CACHE_TTL_SECONDS
+    if exp is not None:
+        expires_at = min(expires_at, exp)
+    
+    claims = (email, user_id, expires_at)
+    if email is not None and user_id is not None:
+        _jwt_cache[key] = claims
+    return claims
+
+async def get_user_by_email(db: AsyncSession, email: str):
     """Get a user by email."""
-    return db.query(User).filter(User.email == email).first()
+    return await db.scalar(lambda_stmt(lambda: select(User).where(User.email == email)))
+
+def _snapshot_user(user: User) -> User:
+    """Copy a user's column values into a detached instance that no session owns."""
+    snapshot = User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+def invalidate_cached_user(user_id: int):
+    """Drop a cached user, e.g. after a password change or deactivation."""
+    _user_cache.pop(user_id, None)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     """Get the current user from the JWT token."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -63,9 +115,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     
     try:
         # Decode the JWT token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        user_id: int = payload.get("user_id")
+        email, user_id, _ = decode_access_token(token)
         
         if email is None or user_id is None:
             raise credentials_exception
@@ -74,10 +124,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
         
-    # Get the user from the database
-    user = get_user_by_email(db, email=token_data.email)
-    if user is None:
-        raise credentials_exception
+    # Get the user from the cache, falling back to the database
+    cached_user = _user_cache.get(token_data.user_id)
+    if cached_user is not None and cached_user.email == token_data.email:
+        # Attach a copy to this session without emitting a SELECT
+        user = await db.merge(cached_user, load=False)
+    else:
+        user = await get_user_by_email(db, email=token_data.email)
+        if user is None:
+            raise credentials_exception
+        _user_cache[user.id] = _snapshot_user(user)
         
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -90,11 +146,18 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-def authenticate_user(db: Session, email: str, password: str):
+async def authenticate_user(db: AsyncSession, email: str, password: str):
     """Authenticate a user by email and password."""
-    user = get_user_by_email(db, email)
+    user = await get_user_by_email(db, email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # bcrypt releases the GIL, so checking in a worker thread keeps the event loop free
+    if not await asyncio.to_thread(verify_password, password, user.hashed_password):
         return False
+    
+    # Upgrade the stored hash when the configured cost has changed
+    if needs_rehash(user.hashed_password):
+        user.hashed_password = await asyncio.to_thread(get_password_hash, password)
+        await db.commit()
+        invalidate_cached_user(user.id)
     return user 
\ No newline at end of file
@@ -1,30 +1,72 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 import os
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
 
 # Get database URL from environment variable, default to SQLite if not found
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 
-# Create SQLite engine
+def _async_database_url(url: str) -> str:
+    """Map a sync database URL onto the matching asyncio driver."""
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_database_url(DATABASE_URL))
+
+# SQLite connections are shared across threads by the pool
+connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+
+# Compiled SQL kept per engine; lambda_stmt queries are keyed into this cache
+QUERY_CACHE_SIZE = 1200
+
+# Sync engine, only used by the schema migrations
 engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
+    DATABASE_URL, connect_args=connect_args, query_cache_size=QUERY_CACHE_SIZE
+)
+
+# SQLite's async pool is not sized; server databases get a bounded pool
+pool_args = {} if ASYNC_DATABASE_URL.startswith("sqlite") else {"pool_size": 20, "max_overflow": 40}
+
+# Create asyncio engine used by the API
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args=connect_args,
+    pool_pre_ping=True,
+    query_cache_size=QUERY_CACHE_SIZE,
+    **pool_args
+)
+
+# WAL lets readers run alongside the writer; NORMAL syncs once per checkpoint instead of per commit
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-64000",
 )
 
-# Create session class for database sessions
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _set_sqlite_pragmas(dbapi_conn, _):
+    """Apply SQLITE_PRAGMAS to each new SQLite connection."""
+    cursor = dbapi_conn.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+if DATABASE_URL.startswith("sqlite"):
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+if ASYNC_DATABASE_URL.startswith("sqlite"):
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+# Create async session class; objects stay usable after commit
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
 
 # Create base class for ORM models
 Base = declarative_base()
 
 # Database dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close() 
\ No newline at end of file
@@ -3,15 +3,43 @@ import os
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent))
+from migrations.create_tables import migrate as create_tables
 from migrations.add_report_fields import migrate as add_report_fields
+from migrations.add_chat_message_indexes import migrate as add_chat_message_indexes
+from migrations.add_report_indexes import migrate as add_report_indexes
+from migrations.move_report_visualizations import migrate as move_report_visualizations
+from migrations.add_upload_workspace import migrate as add_upload_workspace
+from migrations.report_enum_codes import migrate as report_enum_codes
+from migrations.add_chat_user_workspace_index import migrate as add_chat_user_workspace_index
 
 def run_migrations():
     """Run all database migrations"""
     print("Running database migrations...")
     
+    # Baseline schema for fresh databases
+    create_tables()
+    
     # Add report fields migration
     add_report_fields()
     
+    # Add chat and message indexes migration
+    add_chat_message_indexes()
+    
+    # Add report filter index migration
+    add_report_indexes()
+    
+    # Move report visualizations into their own tables
+    move_report_visualizations()
+    
+    # Add upload workspace_id migration
+    add_upload_workspace()
+    
+    # Store report type and status as SMALLINT codes
+    report_enum_codes()
+    
+    # Add chat user/workspace index migration
+    add_chat_user_workspace_index()
+    
     print("Database migrations completed")
     
 if __name__ == "__main__":
@@ -2,39 +2,50 @@ from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
-from dotenv import load_dotenv
+import asyncio
+from contextlib import asynccontextmanager
 
-from .database.database import engine, Base
-from .models import models
-from .routers import auth, workspace, chat, upload, reports
+from .database.database import async_engine
+from .routers import auth, workspace, chat, upload, reports, parser
 from .db_migrations import run_migrations
+from .utils.orjson_response import ORJSONResponse
 
-# Load environment variables
-load_dotenv()
+# Run database migrations; they own the schema, including creating tables.
+# Multi-worker deployments should do this once (RUN_MIGRATIONS=1 in a single
+# init process) and start the workers themselves with RUN_MIGRATIONS=0.
+if os.getenv("RUN_MIGRATIONS", "1") == "1":
+    run_migrations()
 
-# Run database migrations
-run_migrations()
-
-# Create database tables if they don't exist
-models.Base.metadata.create_all(bind=engine)
-
-# Create data directories
 DATA_DIR = os.getenv("DATA_DIR", "./data")
-os.makedirs(os.path.join(DATA_DIR, "embeddings"), exist_ok=True)
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create data directories on startup; on shutdown cancel pending AI answers, stop the PDF workers and close pooled connections."""
+    os.makedirs(os.path.join(DATA_DIR, "embeddings"), exist_ok=True)
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    yield
+    # Stop AI answers still in flight before closing their database connections
+    for task in chat.ai_response_tasks:
+        task.cancel()
+    await asyncio.gather(*chat.ai_response_tasks, return_exceptions=True)
+    parser._PDF_POOL.shutdown(cancel_futures=True)
+    await async_engine.dispose()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Financial Research Assistant API",
     description="API for AI-powered financial research assistant",
     version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
-# Configure CORS
-origins = [
-    "http://localhost:5173",  # React dev server
-    "http://localhost:8000",  # FastAPI server
-    "*",                      # Allow all origins (remove in production)
-]
+# Configure CORS; credentials require explicit origins rather than "*"
+origins = os.getenv(
+    "CORS_ORIGINS",
+    "http://localhost:5173,http://localhost:8000"  # React dev server, FastAPI server
+).split(",")
 
 app.add_middleware(
     CORSMiddleware,
@@ -42,14 +53,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Report list pagination
 )
 
-# Create upload directory if it doesn't exist
-UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-# Mount static file directory for uploads
-app.mount("/files", StaticFiles(directory=UPLOAD_DIR), name="uploads")
+# Mount static file directory for uploads; it is created on startup
+app.mount("/files", StaticFiles(directory=UPLOAD_DIR, check_dir=False), name="uploads")
 
 # Include routers
 app.include_router(auth.router)
@@ -0,0 +1,21 @@
+import enum
+from typing import Dict, Type
+
+# Members are stored as SMALLINT codes numbered in definition order from 1,
+# so only ever add new members at the end
+
+class ReportType(str, enum.Enum):
+    CHAT_EXPORT = "chat_export"
+    FINANCIAL = "financial"
+    RESEARCH = "research"
+    OTHER = "other"
+
+class ReportStatus(str, enum.Enum):
+    DRAFT = "Draft"
+    PUBLISHED = "Published"
+    COMPLETED = "completed"
+    ARCHIVED = "Archived"
+
+def enum_codes(enum_class: Type[enum.Enum]) -> Dict[enum.Enum, int]:
+    """Map each member of an enum to its stored SMALLINT code."""
+    return {member: code for code, member in enumerate(enum_class, start=1)}
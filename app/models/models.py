@@ -1,10 +1,12 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Text, Table
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, SmallInteger, String, DateTime, Text, Table, Index, JSON
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
 from datetime import datetime
 
 from ..database.database import Base
+from .enums import ReportType, ReportStatus, enum_codes
 
 # Association table for workspace members
 workspace_users = Table('workspace_users', Base.metadata,
@@ -12,8 +14,27 @@ workspace_users = Table('workspace_users', Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True)
 )
 
+class SmallIntEnum(TypeDecorator):
+    """Store a string Enum as its SMALLINT code, see enums.enum_codes."""
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum_class):
+        super().__init__()
+        self.enum_class = enum_class
+        self.codes = enum_codes(enum_class)
+        self.members = {code: member for member, code in self.codes.items()}
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else self.codes[self.enum_class(value)]
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else self.members[int(value)]
+
 class User(Base):
     __tablename__ = "users"
+    # Fetch server-side timestamps on INSERT/UPDATE so responses need no refresh
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
@@ -33,6 +54,8 @@ class User(Base):
 
 class Workspace(Base):
     __tablename__ = "workspaces"
+    # Fetch server-side timestamps on INSERT/UPDATE so responses need no refresh
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
@@ -49,11 +72,17 @@ class Workspace(Base):
 
 class Chat(Base):
     __tablename__ = "chats"
+    __table_args__ = (
+        # Serves get_chats by user, optionally narrowed to a workspace
+        Index("ix_chats_user_workspace", "user_id", "workspace_id"),
+    )
+    # Fetch server-side timestamps on INSERT/UPDATE so responses need no refresh
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    workspace_id = Column(Integer, ForeignKey("workspaces.id"), nullable=True)
+    workspace_id = Column(Integer, ForeignKey("workspaces.id"), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -64,6 +93,12 @@ class Chat(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Covers chat_id lookups and keyset pagination on id within a chat
+        Index("ix_msg_chat_id_id", "chat_id", "id"),
+    )
+    # Fetch server defaults (created_at) with RETURNING on insert, so no refresh is needed
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text)
@@ -78,26 +113,65 @@ class Message(Base):
 
 class Report(Base):
     __tablename__ = "reports"
+    __table_args__ = (
+        # Serves get_reports: user_id plus optional type/status/workspace filters
+        Index("ix_reports_user_type_status_ws", "user_id", "report_type", "status", "workspace_id"),
+    )
+    # Fetch server-side timestamps on INSERT/UPDATE so responses need no refresh
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     description = Column(String, nullable=True)
     content = Column(Text)
-    report_type = Column(String, index=True)
-    status = Column(String, default="Draft")
+    report_type = Column(SmallIntEnum(ReportType), index=True)
+    status = Column(SmallIntEnum(ReportStatus), default=ReportStatus.DRAFT)
     pages = Column(Integer, default=0)
     user_id = Column(Integer, ForeignKey("users.id"))
     workspace_id = Column(Integer, ForeignKey("workspaces.id"), nullable=True)
-    visualizations = Column(Text, nullable=True)  # Stores JSON string with tables and graphs
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
     user = relationship("User", back_populates="reports")
     workspace = relationship("Workspace", back_populates="reports")
+    tables = relationship("ReportTable", back_populates="report", order_by="ReportTable.position", cascade="all, delete-orphan")
+    graphs = relationship("ReportGraph", back_populates="report", order_by="ReportGraph.position", cascade="all, delete-orphan")
+
+class ReportTable(Base):
+    __tablename__ = "report_tables"
+
+    id = Column(Integer, primary_key=True, index=True)
+    report_id = Column(Integer, ForeignKey("reports.id"), index=True)
+    position = Column(Integer, default=0)
+    title = Column(String)
+    description = Column(String, nullable=True)
+    data = Column(JSON)  # First row is headers, subsequent rows are data
+
+    # Relationships
+    report = relationship("Report", back_populates="tables")
+
+class ReportGraph(Base):
+    __tablename__ = "report_graphs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    report_id = Column(Integer, ForeignKey("reports.id"), index=True)
+    position = Column(Integer, default=0)
+    type = Column(String)
+    title = Column(String)
+    description = Column(String, nullable=True)
+    labels = Column(JSON)
+    datasets = Column(JSON)
+    xAxis = Column("x_axis", String, nullable=True)
+    yAxis = Column("y_axis", String, nullable=True)
+
+    # Relationships
+    report = relationship("Report", back_populates="graphs")
 
 class Upload(Base):
     __tablename__ = "uploads"
+    # Fetch server-side timestamps on INSERT/UPDATE so responses need no refresh
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String)
@@ -106,6 +180,7 @@ class Upload(Base):
     file_type = Column(String)
     description = Column(String, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"))
+    workspace_id = Column(Integer, ForeignKey("workspaces.id"), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
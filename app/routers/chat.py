@@ -1,16 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
-from typing import List
-import json
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Response, status, WebSocket, WebSocketDisconnect
+from sqlalchemy import select, insert, and_, or_, lambda_stmt
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
+from typing import Dict, List, Optional
+import msgspec
+from pydantic import BaseModel, TypeAdapter
 
-from ..database.database import get_db, SessionLocal
-from ..models.models import User, Chat, Message, Workspace
+from ..database.database import get_db, AsyncSessionLocal
+from ..models.models import User, Chat, Message, workspace_users
 from ..schemas.schemas import (
     ChatCreate, ChatResponse, MessageCreate, MessageResponse, 
-    WebSocketMessage, QueryResponse, TableModel, GraphModel
+    WebSocketMessage, WebSocketMessageData, WebSocketChatFrame, QueryResponse, TableModel, GraphModel
 )
 from ..auth.auth import get_current_active_user
+from ..services.membership import workspace_access
+from ..utils.orjson_response import ORJSONResponse
 import asyncio
 
 from src.main import process_query
@@ -23,46 +27,129 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Built once so list endpoints do not rebuild a validator/serializer per request
+_chat_list_adapter = TypeAdapter(List[ChatResponse])
+_msg_list_adapter = TypeAdapter(List[MessageResponse])
+
+# Reused across frames so msgspec does not rebuild them per message
+_ws_encoder = msgspec.json.Encoder()
+_ws_frame_decoder = msgspec.json.Decoder(WebSocketChatFrame)
+
+# Core INSERT for the WebSocket hot path; returns the generated id and timestamp
+_msg_insert = insert(Message.__table__).returning(Message.__table__.c.id, Message.__table__.c.created_at)
+
+async def insert_message(db: AsyncSession, content: str, is_from_user: bool, chat_id: int, user_id: int):
+    """Insert and commit a message without going through the ORM unit of work."""
+    row = (await db.execute(_msg_insert, {
+        "content": content,
+        "is_from_user": is_from_user,
+        "chat_id": chat_id,
+        "user_id": user_id
+    })).one()
+    await db.commit()
+    return row
+
+# Seconds a client gets to accept a broadcast before it is dropped, so one slow
+# reader cannot hold up the rest of the chat
+BROADCAST_SEND_TIMEOUT = 2.0
+
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: dict = {}  # chat_id -> list of WebSocket connections
+        self.active_connections: Dict[int, Dict[WebSocket, int]] = {}  # chat_id -> {WebSocket: user/session id}
 
     async def connect(self, websocket: WebSocket, chat_id: int, user_id: int):
         await websocket.accept()
-        if chat_id not in self.active_connections:
-            self.active_connections[chat_id] = []
-        self.active_connections[chat_id].append({"websocket": websocket, "user_id": user_id})
+        self.active_connections.setdefault(chat_id, {})[websocket] = user_id
 
     def disconnect(self, websocket: WebSocket, chat_id: int):
-        if chat_id in self.active_connections:
-            self.active_connections[chat_id] = [
-                conn for conn in self.active_connections[chat_id] 
-                if conn["websocket"] != websocket
-            ]
-            if not self.active_connections[chat_id]:
+        connections = self.active_connections.get(chat_id)
+        if connections is not None:
+            connections.pop(websocket, None)
+            if not connections:
                 del self.active_connections[chat_id]
 
-    async def broadcast(self, message: dict, chat_id: int):
-        if chat_id in self.active_connections:
-            for connection in self.active_connections[chat_id]:
-                await connection["websocket"].send_text(json.dumps(message))
+    async def broadcast(self, message: WebSocketMessage, chat_id: int):
+        connections = list(self.active_connections.get(chat_id, {}))
+        if not connections:
+            return
+        
+        # Serialize once (datetimes natively) and send to every client in parallel.
+        # Frames stay text: the browser client JSON.parses event.data, which is a Blob for binary frames
+        payload = _ws_encoder.encode(message).decode()
+        results = await asyncio.gather(
+            *(asyncio.wait_for(websocket.send_text(payload), BROADCAST_SEND_TIMEOUT) for websocket in connections),
+            return_exceptions=True
+        )
+        
+        # Drop clients whose send failed, and close the ones too slow to keep up
+        slow = []
+        for websocket, result in zip(connections, results):
+            if isinstance(result, Exception):
+                self.disconnect(websocket, chat_id)
+                if isinstance(result, asyncio.TimeoutError):
+                    slow.append(websocket)
+        
+        if slow:
+            await asyncio.gather(
+                *(asyncio.wait_for(websocket.close(code=1013), BROADCAST_SEND_TIMEOUT) for websocket in slow),
+                return_exceptions=True
+            )
 
 manager = ConnectionManager()
 
+async def get_chat_authorized(db: AsyncSession, chat_id: int, user_id: int):
+    """
+    Fetch a chat and whether the user may access it, in a single query.
+    
+    Returns (None, False) when the chat does not exist. Access is granted to
+    the chat owner and to members of the chat's workspace.
+    """
+    row = (await db.execute(lambda_stmt(
+        lambda: select(Chat, or_(Chat.user_id == user_id, workspace_users.c.user_id.is_not(None)))
+        .outerjoin(
+            workspace_users,
+            and_(workspace_users.c.workspace_id == Chat.workspace_id, workspace_users.c.user_id == user_id)
+        )
+        .where(Chat.id == chat_id)
+        # Membership comes from the join; fail loudly if a handler lazy-loads anything
+        .options(raiseload("*"))
+    ))).first()
+    
+    if row is None:
+        return None, False
+    return row[0], bool(row[1])
+
+async def get_authorized_chat(
+    chat_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Chat:
+    """Dependency resolving the path's chat, raising 404/403 unless the user may access it."""
+    chat, authorized = await get_chat_authorized(db, chat_id, current_user.id)
+    
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    
+    # Check if the user owns the chat or is a member of the workspace
+    if not authorized:
+        raise HTTPException(status_code=403, detail="Not authorized to access this chat")
+    
+    return chat
+
 @router.post("/", response_model=ChatResponse, status_code=status.HTTP_201_CREATED)
-def create_chat(
+async def create_chat(
     chat: ChatCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Create a new chat."""
     # If workspace_id is provided, check if user is a member of the workspace
     if chat.workspace_id:
-        workspace = db.query(Workspace).filter(Workspace.id == chat.workspace_id).first()
-        if not workspace:
+        access = await workspace_access(db, chat.workspace_id, current_user.id)
+        if access is None:
             raise HTTPException(status_code=404, detail="Workspace not found")
-        if current_user not in workspace.members:
+        if not access:
             raise HTTPException(status_code=403, detail="Not authorized to create chat in this workspace")
     
     db_chat = Chat(
@@ -72,65 +159,57 @@ def create_chat(
     )
     
     db.add(db_chat)
-    db.commit()
-    db.refresh(db_chat)
+    await db.commit()
     
-    return db_chat
+    # Validate once from the row; returning a Response skips response_model re-validation
+    return ORJSONResponse(ChatResponse.model_validate(db_chat), status_code=status.HTTP_201_CREATED)
 
 @router.get("/", response_model=List[ChatResponse])
-def get_chats(
-    skip: int = 0,
+async def get_chats(
+    after_id: Optional[int] = None,
     limit: int = 100,
     workspace_id: int = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get all chats for the current user, optionally filtered by workspace."""
-    query = db.query(Chat).filter(Chat.user_id == current_user.id)
+    """Get the current user's chats oldest first, optionally filtered by workspace; page with after_id."""
+    user_id = current_user.id
+    query = lambda_stmt(lambda: select(Chat).where(Chat.user_id == user_id))
     
     if workspace_id:
         # Check if user is a member of the workspace
-        workspace = db.query(Workspace).filter(Workspace.id == workspace_id).first()
-        if not workspace:
+        access = await workspace_access(db, workspace_id, current_user.id)
+        if access is None:
             raise HTTPException(status_code=404, detail="Workspace not found")
-        if current_user not in workspace.members:
+        if not access:
             raise HTTPException(status_code=403, detail="Not authorized to access this workspace")
         
-        query = query.filter(Chat.workspace_id == workspace_id)
+        query += lambda s: s.where(Chat.workspace_id == workspace_id)
+    
+    # Keyset pagination: resume after the last chat id the client has seen
+    if after_id is not None:
+        query += lambda s: s.where(Chat.id > after_id)
+    
+    query += lambda s: s.order_by(Chat.id).limit(limit)
+    result = await db.scalars(query)
     
-    return query.offset(skip).limit(limit).all()
+    # Serialize straight to JSON bytes instead of through jsonable_encoder
+    chats = _chat_list_adapter.validate_python(result.all(), from_attributes=True)
+    return Response(_chat_list_adapter.dump_json(chats), media_type="application/json")
 
 @router.get("/{chat_id}", response_model=ChatResponse)
-def get_chat(
-    chat_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-):
+async def get_chat(chat: Chat = Depends(get_authorized_chat)):
     """Get a specific chat by ID."""
-    chat = db.query(Chat).filter(Chat.id == chat_id).first()
-    
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    
-    # Check if the user owns the chat or is a member of the workspace
-    if chat.user_id != current_user.id:
-        if chat.workspace_id:
-            workspace = db.query(Workspace).filter(Workspace.id == chat.workspace_id).first()
-            if not workspace or current_user not in workspace.members:
-                raise HTTPException(status_code=403, detail="Not authorized to access this chat")
-        else:
-            raise HTTPException(status_code=403, detail="Not authorized to access this chat")
-    
     return chat
 
 @router.delete("/{chat_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_chat(
+async def delete_chat(
     chat_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Delete a chat."""
-    chat = db.query(Chat).filter(Chat.id == chat_id).first()
+    chat, _ = await get_chat_authorized(db, chat_id, current_user.id)
     
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
@@ -139,33 +218,20 @@ def delete_chat(
     if chat.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this chat")
     
-    db.delete(chat)
-    db.commit()
+    await db.delete(chat)
+    await db.commit()
     
     return None
 
 @router.post("/{chat_id}/messages", response_model=MessageResponse)
-def create_message(
+async def create_message(
     chat_id: int,
     message: MessageCreate,
-    db: Session = Depends(get_db),
+    chat: Chat = Depends(get_authorized_chat),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Create a new message in a chat."""
-    chat = db.query(Chat).filter(Chat.id == chat_id).first()
-    
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    
-    # Check if the user has access to the chat
-    if chat.user_id != current_user.id:
-        if chat.workspace_id:
-            workspace = db.query(Workspace).filter(Workspace.id == chat.workspace_id).first()
-            if not workspace or current_user not in workspace.members:
-                raise HTTPException(status_code=403, detail="Not authorized to post in this chat")
-        else:
-            raise HTTPException(status_code=403, detail="Not authorized to post in this chat")
-    
     db_message = Message(
         content=message.content,
         is_from_user=message.is_from_user,
@@ -174,48 +240,126 @@ def create_message(
     )
     
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+    await db.commit()
     
-    return db_message
+    return ORJSONResponse(MessageResponse.model_validate(db_message))
 
 @router.get("/{chat_id}/messages", response_model=List[MessageResponse])
-def get_messages(
+async def get_messages(
     chat_id: int,
-    skip: int = 0,
+    before_id: Optional[int] = None,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    chat: Chat = Depends(get_authorized_chat),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all messages in a chat."""
-    chat = db.query(Chat).filter(Chat.id == chat_id).first()
+    """Get the latest messages in a chat, or those older than before_id, oldest first."""
+    # Keyset pagination: walk the (chat_id, id) index backwards from before_id
+    query = lambda_stmt(lambda: select(Message).where(Message.chat_id == chat_id))
+    if before_id is not None:
+        query += lambda s: s.where(Message.id < before_id)
     
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    
-    # Check if the user has access to the chat
-    if chat.user_id != current_user.id:
-        if chat.workspace_id:
-            workspace = db.query(Workspace).filter(Workspace.id == chat.workspace_id).first()
-            if not workspace or current_user not in workspace.members:
-                raise HTTPException(status_code=403, detail="Not authorized to view this chat")
-        else:
-            raise HTTPException(status_code=403, detail="Not authorized to view this chat")
+    query += lambda s: s.order_by(Message.id.desc()).limit(limit)
+    result = await db.scalars(query)
+    messages = result.all()
+    messages.reverse()
     
-    return db.query(Message).filter(Message.chat_id == chat_id).offset(skip).limit(limit).all()
+    # Serialize straight to JSON bytes instead of through jsonable_encoder
+    messages = _msg_list_adapter.validate_python(messages, from_attributes=True)
+    return Response(_msg_list_adapter.dump_json(messages), media_type="application/json")
+
+# Background AI answers still running. Holding them here keeps the tasks alive
+# after their socket disconnects, so the answer is still stored and broadcast,
+# and lets the app cancel them on shutdown.
+ai_response_tasks = set()
+
+async def _handle_ai_response(
+    chat_id: int,
+    content: str,
+    user_id: int,
+    include_tables: bool = True,
+    include_graphs: bool = True,
+    max_tables: int = 5,
+    max_graphs: int = 3,
+    session_id: str = None,
+    workspace_id: int = None
+):
+    """Run the AI on a user message, store the answer and broadcast it to the chat."""
+    try:
+        # Process the query with the AI in a worker thread so other clients keep being served
+        ai_response_obj = await asyncio.to_thread(process_query, content, user_id=str(user_id))
+        
+        # Extract the text response
+        ai_response_text = ai_response_obj.get("response", "Sorry, I couldn't process your request.")
+        
+        # Extract or generate visualizations
+        tables = ai_response_obj.get("tables", [])
+        graphs = ai_response_obj.get("graphs", [])
+        
+        # Only extract from the text what the AI did not already return
+        need_tables = include_tables and not tables
+        need_graphs = include_graphs and not graphs
+        
+        if need_tables or need_graphs:
+            visualizations = await asyncio.to_thread(
+                extract_visualizations,
+                ai_response_text, 
+                content,
+                max_tables=max_tables,
+                max_graphs=max_graphs,
+                include_tables=need_tables,
+                include_graphs=need_graphs
+            )
+            
+            if need_tables:
+                tables = visualizations.get("tables", [])
+                
+            if need_graphs:
+                graphs = visualizations.get("graphs", [])
+
+        # Create AI response message in the database; the receive loop owns the other session
+        async with AsyncSessionLocal() as db:
+            # AI response is still associated with the user
+            ai_message = await insert_message(db, ai_response_text, False, chat_id, user_id)
+        
+        # Prepare AI response with session and workspace IDs if provided
+        ai_response_data = WebSocketMessage(
+            type="message",
+            message_type="bot",
+            session_id=session_id or None,
+            workspace_id=workspace_id or None,
+            data=WebSocketMessageData(
+                id=ai_message.id,
+                uuid=str(ai_message.id),
+                user="AI Assistant",
+                format="md", # Change to markdown format for better rendering
+                content=ai_response_text,
+                is_from_user=False,
+                user_id=user_id,
+                chat_id=chat_id,
+                created_at=ai_message.created_at,
+                visualizations={
+                    "graphs": graphs,
+                    "tables": tables
+                }
+            )
+        )
+        
+        # Broadcast AI response
+        await manager.broadcast(ai_response_data, chat_id)
+    except Exception as e:
+        print(f"Error answering message in chat {chat_id}: {e}")
 
 @router.websocket("/ws/{chat_id}")
 async def websocket_endpoint(websocket: WebSocket, chat_id: int, token: str, session_id: str = None, workspace_id: int = None):
     """WebSocket endpoint for real-time chat messages."""
     try:
         # Authenticate user from token
-        db = SessionLocal()
-        try:
-            from ..auth.auth import get_current_user
+        from ..auth.auth import get_current_user
+        async with AsyncSessionLocal() as db:
             current_user = await get_current_user(token=token, db=db)
             
             # Check if user has access to the chat
-            chat = db.query(Chat).filter(Chat.id == chat_id).first()
+            chat, authorized = await get_chat_authorized(db, chat_id, current_user.id)
             if not chat:
                 await websocket.close(code=1008, reason="Chat not found")
                 return
@@ -225,15 +369,9 @@ async def websocket_endpoint(websocket: WebSocket, chat_id: int, token: str, ses
                 await websocket.close(code=1008, reason="Workspace ID mismatch")
                 return
                 
-            if chat.user_id != current_user.id:
-                if chat.workspace_id:
-                    workspace = db.query(Workspace).filter(Workspace.id == chat.workspace_id).first()
-                    if not workspace or current_user not in workspace.members:
-                        await websocket.close(code=1008, reason="Not authorized to access this chat")
-                        return
-                else:
-                    await websocket.close(code=1008, reason="Not authorized to access this chat")
-                    return
+            if not authorized:
+                await websocket.close(code=1008, reason="Not authorized to access this chat")
+                return
             
             client_id = session_id or current_user.id
             await manager.connect(websocket, chat_id, client_id)
@@ -241,135 +379,75 @@ async def websocket_endpoint(websocket: WebSocket, chat_id: int, token: str, ses
             try:
                 while True:
                     data = await websocket.receive_text()
-                    message_data = json.loads(data)
+                    
+                    # Decode and validate the frame in one pass
+                    try:
+                        frame = _ws_frame_decoder.decode(data)
+                    except msgspec.DecodeError as e:
+                        await websocket.send_text(_ws_encoder.encode({
+                            "error": f"Invalid message: {e}"
+                        }).decode())
+                        continue
 
-                    print(f"Received data: {message_data}")
+                    print(f"Received data: {frame}")
                     
                     # Extract message content from received data
-                    content = message_data.get("content", "")
+                    content = frame.content
                     if not content:
-                        await websocket.send_text(json.dumps({
+                        await websocket.send_text(_ws_encoder.encode({
                             "error": "Message content is required"
-                        }))
+                        }).decode())
                         continue
                     
                     # Extract visualization options if provided
-                    visualization_options = message_data.get("visualization_options", {})
-                    include_tables = visualization_options.get("include_tables", True)
-                    include_graphs = visualization_options.get("include_graphs", True)
-                    max_tables = visualization_options.get("max_tables", 5)
-                    max_graphs = visualization_options.get("max_graphs", 3)
+                    visualization_options = frame.visualization_options
+                    include_tables = visualization_options.include_tables
+                    include_graphs = visualization_options.include_graphs
+                    max_tables = visualization_options.max_tables
+                    max_graphs = visualization_options.max_graphs
                     
                     # Create a new message in the database
-                    db_message = Message(
-                        content=content,
-                        is_from_user=True,
-                        chat_id=chat_id,
-                        user_id=current_user.id
-                    )
-                    
-                    db.add(db_message)
-                    db.commit()
-                    db.refresh(db_message)
+                    db_message = await insert_message(db, content, True, chat_id, current_user.id)
                     
                     # Include session_id in the response if it was provided
-                    message_response = {
-                        "type": "message",
-                        "message_type": "user",
-                        "data": {
-                            "id": db_message.id,
-                            "uuid": str(db_message.id),
-                            "user": current_user.username or "User",
-                            "format": "txt",
-                            "content": db_message.content,
-                            "is_from_user": db_message.is_from_user,
-                            "user_id": db_message.user_id,
-                            "chat_id": db_message.chat_id,
-                            "created_at": db_message.created_at.isoformat()
-                        }
-                    }
-                    
-                    if session_id:
-                        message_response["session_id"] = session_id
-                        
-                    if workspace_id:
-                        message_response["workspace_id"] = workspace_id
+                    message_response = WebSocketMessage(
+                        type="message",
+                        message_type="user",
+                        session_id=session_id or None,
+                        workspace_id=workspace_id or None,
+                        data=WebSocketMessageData(
+                            id=db_message.id,
+                            uuid=str(db_message.id),
+                            user=current_user.username or "User",
+                            format="txt",
+                            content=content,
+                            is_from_user=True,
+                            user_id=current_user.id,
+                            chat_id=chat_id,
+                            created_at=db_message.created_at
+                        )
+                    )
                     
                     # Broadcast the message to all connected clients
                     await manager.broadcast(message_response, chat_id)
 
-                    # Process the query with the AI
-                    ai_response_obj = process_query(db_message.content, user_id=str(current_user.id))
-                    
-                    # Extract the text response
-                    ai_response_text = ai_response_obj.get("response", "Sorry, I couldn't process your request.")
-                    
-                    # Extract or generate visualizations
-                    tables = ai_response_obj.get("tables", [])
-                    graphs = ai_response_obj.get("graphs", [])
-                    
-                    # If tables and graphs are empty, and we should include them, extract them from the text
-                    if (include_tables or include_graphs) and (not tables or not graphs):
-                        visualizations = extract_visualizations(
-                            ai_response_text, 
-                            db_message.content,
-                            max_tables=max_tables,
-                            max_graphs=max_graphs
-                        )
-                        
-                        if include_tables:
-                            tables = visualizations.get("tables", [])
-                            
-                        if include_graphs:
-                            graphs = visualizations.get("graphs", [])
-
-                    # Create AI response message in the database
-                    ai_message = Message(
-                        content=ai_response_text,
-                        is_from_user=False,
-                        chat_id=chat_id,
-                        user_id=current_user.id  # AI response is still associated with the user
-                    )
-                    
-                    db.add(ai_message)
-                    db.commit()
-                    db.refresh(ai_message)
-                    
-                    # Prepare AI response with session and workspace IDs if provided
-                    ai_response_data = {
-                        "type": "message",
-                        "message_type": "bot",
-                        "data": {
-                            "id": ai_message.id,
-                            "uuid": str(ai_message.id),
-                            "user": "AI Assistant",
-                            "format": "md", # Change to markdown format for better rendering
-                            "content": ai_message.content,
-                            "is_from_user": ai_message.is_from_user,
-                            "user_id": ai_message.user_id,
-                            "chat_id": ai_message.chat_id,
-                            "created_at": ai_message.created_at.isoformat(),
-                            "visualizations": {
-                                "graphs": graphs,
-                                "tables": tables
-                            }
-                        }
-                    }
-                    
-                    if session_id:
-                        ai_response_data["session_id"] = session_id
-                        
-                    if workspace_id:
-                        ai_response_data["workspace_id"] = workspace_id
-                    
-                    # Broadcast AI response
-                    await manager.broadcast(ai_response_data, chat_id)
+                    # Answer in the background so the receive loop keeps reading new messages
+                    task = asyncio.create_task(_handle_ai_response(
+                        chat_id,
+                        content,
+                        current_user.id,
+                        include_tables=include_tables,
+                        include_graphs=include_graphs,
+                        max_tables=max_tables,
+                        max_graphs=max_graphs,
+                        session_id=session_id,
+                        workspace_id=workspace_id
+                    ))
+                    ai_response_tasks.add(task)
+                    task.add_done_callback(ai_response_tasks.discard)
                     
             except WebSocketDisconnect:
                 manager.disconnect(websocket, chat_id)
-                
-        finally:
-            db.close()
             
     except Exception as e:
         await websocket.close(code=1008, reason=str(e)) 
@@ -381,13 +459,13 @@ class QueryRequest(BaseModel):
 @router.post("/query", response_model=QueryResponse)
 async def process_chat_query(
     query_request: QueryRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Process a direct query and return response with visualizations"""
     
-    # Process the query
-    result = process_query(query_request.query, user_id=str(current_user.id))
+    # Process the query in a worker thread to keep the event loop free
+    result = await asyncio.to_thread(process_query, query_request.query, user_id=str(current_user.id))
     
     # Return the structured response
     return QueryResponse(
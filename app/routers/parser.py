@@ -1,21 +1,53 @@
 import os
 import json
 import fitz  # PyMuPDF
-import base64
+import pybase64
 import asyncio
-from openai import OpenAI
+from concurrent.futures import ProcessPoolExecutor
+from openai import AsyncOpenAI
 from pathlib import Path
-from dotenv import load_dotenv
-
-load_dotenv()
 
 # Initialize OpenAI client
-client = OpenAI()
+client = AsyncOpenAI()
+
+# Maximum number of pages sent to OpenAI Vision at the same time
+PAGE_CONCURRENCY = 5
+
+# Cap on the extracted text per page
+EXTRACT_MAX_TOKENS = 4096
+
+# Shared instructions for every page; a constant prefix is eligible for provider-side prompt caching
+_EXTRACT_PROMPT = (
+    "You are a data extractor. This image is a page from a financial PDF. "
+    "Extract all information in structured format as JSON or Markdown tables.\n"
+    "- Include all tabular data, metrics, figures.\n"
+    "- Preserve sections like 'Financial Highlights', 'Shareholding Pattern', etc.\n"
+    "- Do NOT summarize. Just extract data.\n"
+    "- Use Markdown tables or nested JSON arrays/objects if needed.\n"
+    "- No interpretation, only extraction."
+)
+
+# Worker processes for CPU-bound page rendering; the event loop only awaits the network
+_PDF_POOL = ProcessPoolExecutor(max_workers=os.cpu_count())
 
 # Get upload and data directories
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
 DATA_DIR = os.getenv("DATA_DIR", "./data")
 
+def _page_count(file_path):
+    """Return the number of pages in a PDF (runs in the worker pool)."""
+    with fitz.open(file_path) as doc:
+        return len(doc)
+
+def _rasterize_page(file_path, page_num):
+    """Render a full page as JPEG bytes (runs in the worker pool)."""
+    # Opening per call is cheap next to rendering and keeps no stale handles in the workers
+    with fitz.open(file_path) as doc:
+        page = doc.load_page(page_num)
+        # 150 DPI JPEG is plenty for the vision model
+        pix = page.get_pixmap(dpi=150)
+        return pix.tobytes("jpeg", jpg_quality=85)
+
 async def process_single_page_as_image(file_path, page_num):
     """
     Renders a full page as an image and extracts a textual description using OpenAI Vision.
@@ -23,38 +55,30 @@ async def process_single_page_as_image(file_path, page_num):
     chunks = []
 
     try:
-        doc = fitz.open(file_path)
-        page = doc.load_page(page_num)
-
-        # Render full page as image
-        pix = page.get_pixmap(dpi=200)
-        image_bytes = pix.tobytes("png")
-        base64_image = base64.b64encode(image_bytes).decode()
+        # Render full page as image in a worker process
+        loop = asyncio.get_running_loop()
+        image_bytes = await loop.run_in_executor(_PDF_POOL, _rasterize_page, file_path, page_num)
+        base64_image = pybase64.b64encode(image_bytes).decode()
 
         # Send full-page image to OpenAI Vision
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
+                {"role": "system", "content": _EXTRACT_PROMPT},
                 {
                     "role": "user",
                     "content": [
-                        {"type": "text", "text": 
-                            "You are a data extractor. This image is a page from a financial PDF. Extract all information in structured format as JSON or Markdown tables.\n\
-                            - Include all tabular data, metrics, figures.\n\
-                            - Preserve sections like 'Financial Highlights', 'Shareholding Pattern', etc.\n\
-                            - Do NOT summarize. Just extract data.\n\
-                            - Use Markdown tables or nested JSON arrays/objects if needed.\n\
-                            - No interpretation, only extraction."},
-
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/png;base64,{base64_image}"
+                                "url": f"data:image/jpeg;base64,{base64_image}"
                             },
                         },
                     ],
                 }
             ],
+            temperature=0,
+            max_tokens=EXTRACT_MAX_TOKENS,
         )
 
         page_description = response.choices[0].message.content
@@ -62,8 +86,6 @@ async def process_single_page_as_image(file_path, page_num):
 
     except Exception as e:
         print(f"Error processing page {page_num + 1} in file {file_path}: {e}")
-    finally:
-        doc.close()
 
     return chunks
 
@@ -82,15 +104,23 @@ async def process_pdf_file(file_path, output_dir):
             print(f"❌ File {file_path} is not a PDF.")
             return None
             
-        doc = fitz.open(file_path)
-        total_pages = len(doc)
-        doc.close()
+        loop = asyncio.get_running_loop()
+        total_pages = await loop.run_in_executor(_PDF_POOL, _page_count, file_path)
 
-        all_chunks = []
         # Process first 5 pages max to save API costs
         max_pages = min(total_pages, 5)
-        for page_num in range(max_pages):
-            page_chunks = await process_single_page_as_image(file_path, page_num)
+        
+        # Pages are independent, so extract them concurrently
+        semaphore = asyncio.Semaphore(PAGE_CONCURRENCY)
+        
+        async def bounded(page_num):
+            async with semaphore:
+                return await process_single_page_as_image(file_path, page_num)
+        
+        results = await asyncio.gather(*[bounded(page_num) for page_num in range(max_pages)])
+        
+        all_chunks = []
+        for page_chunks in results:
             all_chunks.extend(page_chunks)
 
         # Create output directory if it doesn't exist
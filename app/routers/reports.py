@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
-import json
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select, update, delete, lambda_stmt, type_coerce, Text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Dict, Any, Optional, Tuple
+import base64
+import orjson
 
 from ..database.database import get_db
-from ..models.models import User, Report, Workspace
-from ..schemas.schemas import ReportCreate, ReportResponse, ReportUpdate, TableModel, GraphModel
+from ..models.models import User, Report, ReportTable, ReportGraph
+from ..models.enums import ReportType, ReportStatus
+from ..schemas.schemas import ReportCreate, ReportResponse, ReportUpdate, TableModel, GraphModel, GraphDataset
 from ..auth.auth import get_current_active_user
+from ..services.membership import user_is_member, workspace_access
+from ..utils.orjson_response import ORJSONResponse
 
 router = APIRouter(
     prefix="/reports",
@@ -14,34 +20,133 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Visualizations are validated by ReportCreate on the way in, so rows read back
+# from our own database can skip re-validation
+TRUSTED_DB = True
+
+def report_fields(report: Report) -> Dict[str, Any]:
+    """Get a report row's column values as a dict."""
+    return {column.name: getattr(report, column.name) for column in Report.__table__.columns}
+
+def build_report_response(report: Report, include_visualizations: bool = True) -> ReportResponse:
+    """Build a ReportResponse from a report row, optionally with its tables and graphs."""
+    fields = report_fields(report)
+    
+    tables = report.tables if include_visualizations else []
+    graphs = report.graphs if include_visualizations else []
+    
+    if not TRUSTED_DB:
+        return ReportResponse.model_validate({
+            **fields,
+            "tables": [TableModel.model_validate(table, from_attributes=True) for table in tables],
+            "graphs": [GraphModel.model_validate(graph, from_attributes=True) for graph in graphs]
+        })
+    
+    return ReportResponse.model_construct(
+        **fields,
+        tables=[
+            TableModel.model_construct(title=table.title, description=table.description, data=table.data)
+            for table in tables
+        ],
+        graphs=[
+            GraphModel.model_construct(
+                type=graph.type,
+                title=graph.title,
+                description=graph.description,
+                labels=graph.labels,
+                datasets=[GraphDataset.model_construct(**dataset) for dataset in graph.datasets or []],
+                xAxis=graph.xAxis,
+                yAxis=graph.yAxis
+            )
+            for graph in graphs
+        ]
+    )
+
+def raw_json(value: Optional[str]):
+    """Wrap JSON text read from the database so orjson writes it out as-is."""
+    return orjson.Fragment(value) if value is not None else None
+
+async def load_raw_visualizations(db: AsyncSession, report_ids: List[int]) -> Tuple[Dict[int, list], Dict[int, list]]:
+    """
+    Load tables and graphs for the given reports, keyed by report id.
+    
+    JSON columns are selected as text and passed through as orjson fragments,
+    so the read path never decodes, validates or re-encodes them.
+    """
+    tables = {report_id: [] for report_id in report_ids}
+    graphs = {report_id: [] for report_id in report_ids}
+    if not report_ids:
+        return tables, graphs
+    
+    table_rows = await db.execute(
+        select(ReportTable.report_id, ReportTable.title, ReportTable.description, type_coerce(ReportTable.data, Text))
+        .where(ReportTable.report_id.in_(report_ids))
+        .order_by(ReportTable.report_id, ReportTable.position)
+    )
+    for report_id, title, description, data in table_rows:
+        tables[report_id].append({"title": title, "description": description, "data": raw_json(data)})
+    
+    graph_rows = await db.execute(
+        select(
+            ReportGraph.report_id,
+            ReportGraph.type,
+            ReportGraph.title,
+            ReportGraph.description,
+            type_coerce(ReportGraph.labels, Text),
+            type_coerce(ReportGraph.datasets, Text),
+            ReportGraph.xAxis,
+            ReportGraph.yAxis
+        )
+        .where(ReportGraph.report_id.in_(report_ids))
+        .order_by(ReportGraph.report_id, ReportGraph.position)
+    )
+    for report_id, type_, title, description, labels, datasets, x_axis, y_axis in graph_rows:
+        graphs[report_id].append({
+            "type": type_,
+            "title": title,
+            "description": description,
+            "labels": raw_json(labels),
+            "datasets": raw_json(datasets),
+            "xAxis": x_axis,
+            "yAxis": y_axis
+        })
+    
+    return tables, graphs
+
+def build_report_tables(tables: List[TableModel], report_id: Optional[int] = None) -> List[ReportTable]:
+    """Turn validated tables into ReportTable rows, keeping their order."""
+    return [
+        ReportTable(report_id=report_id, position=position, **table.model_dump())
+        for position, table in enumerate(tables)
+    ]
+
+def build_report_graphs(graphs: List[GraphModel], report_id: Optional[int] = None) -> List[ReportGraph]:
+    """Turn validated graphs into ReportGraph rows, keeping their order."""
+    return [
+        ReportGraph(report_id=report_id, position=position, **graph.model_dump())
+        for position, graph in enumerate(graphs)
+    ]
+
 @router.post("/", response_model=ReportResponse, status_code=status.HTTP_201_CREATED)
-def create_report(
+async def create_report(
     report: ReportCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Create a new report, optionally with visualization data."""
     
     # Check workspace access if a workspace_id is provided
     if report.workspace_id:
-        workspace = db.query(Workspace).filter(Workspace.id == report.workspace_id).first()
-        if not workspace:
+        access = await workspace_access(db, report.workspace_id, current_user.id)
+        if access is None:
             raise HTTPException(status_code=404, detail="Workspace not found")
-        
-        # Check if the user has access to the workspace
-        if current_user not in workspace.members:
+        if not access:
             raise HTTPException(status_code=403, detail="Not authorized to create report in this workspace")
     
     # Extract visualization data
     tables = report.tables if hasattr(report, 'tables') and report.tables else []
     graphs = report.graphs if hasattr(report, 'graphs') and report.graphs else []
     
-    # Prepare visualizations JSON
-    visualizations = {
-        "tables": [table.dict() for table in tables],
-        "graphs": [graph.dict() for graph in graphs]
-    }
-    
     # Create the report record
     db_report = Report(
         title=report.title,
@@ -52,117 +157,120 @@ def create_report(
         pages=report.pages,
         user_id=current_user.id,
         workspace_id=report.workspace_id,
-        visualizations=json.dumps(visualizations)
+        tables=build_report_tables(tables),
+        graphs=build_report_graphs(graphs)
     )
     
     db.add(db_report)
-    db.commit()
-    db.refresh(db_report)
+    await db.commit()
     
-    # Prepare response with visualizations
-    response = ReportResponse.from_orm(db_report)
-    
-    # Add visualization data to response
+    # Prepare response with visualizations; the input was validated, so skip response_model
+    return ORJSONResponse(build_report_response(db_report), status_code=status.HTTP_201_CREATED)
+
+def encode_cursor(report_id: int) -> str:
+    """Encode the last report id of a page as an opaque cursor."""
+    return base64.urlsafe_b64encode(str(report_id).encode()).decode()
+
+def decode_cursor(cursor: str) -> int:
+    """Decode a cursor produced by encode_cursor."""
     try:
-        if db_report.visualizations:
-            vis_data = json.loads(db_report.visualizations)
-            response.tables = [TableModel(**table) for table in vis_data.get("tables", [])]
-            response.graphs = [GraphModel(**graph) for graph in vis_data.get("graphs", [])]
-    except (json.JSONDecodeError, ValueError, TypeError) as e:
-        print(f"Error parsing visualizations: {e}")
-    
-    return response
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.get("/", response_model=List[ReportResponse])
-def get_reports(
-    skip: int = 0,
-    limit: int = 100,
-    report_type: str = None,
-    status: str = None,
+async def get_reports(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    report_type: Optional[ReportType] = None,
+    status: Optional[ReportStatus] = None,
     workspace_id: int = None,
-    db: Session = Depends(get_db),
+    include: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get all reports for the current user, with optional filters."""
-    query = db.query(Report).filter(Report.user_id == current_user.id)
+    """
+    Get reports for the current user, newest first, with optional filters.
+    
+    Pages are keyed on report id. When more reports exist, the cursor for the
+    next page is returned in the X-Next-Cursor header. Tables and graphs are
+    only loaded, and only present in the response, with include=visualizations.
+    """
+    include_visualizations = include is not None and "visualizations" in include.split(",")
+    
+    user_id = current_user.id
+    query = lambda_stmt(lambda: select(Report).where(Report.user_id == user_id))
     
     # Apply filters if provided
     if report_type:
-        query = query.filter(Report.report_type == report_type)
+        query += lambda s: s.where(Report.report_type == report_type)
     if status:
-        query = query.filter(Report.status == status)
+        query += lambda s: s.where(Report.status == status)
     if workspace_id:
         # Check if user has access to the workspace
-        workspace = db.query(Workspace).filter(Workspace.id == workspace_id).first()
-        if not workspace:
+        access = await workspace_access(db, workspace_id, current_user.id)
+        if access is None:
             raise HTTPException(status_code=404, detail="Workspace not found")
-        if current_user not in workspace.members:
+        if not access:
             raise HTTPException(status_code=403, detail="Not authorized to access this workspace")
         
-        query = query.filter(Report.workspace_id == workspace_id)
-    
-    reports = query.offset(skip).limit(limit).all()
-    
-    # Add visualization data to responses
-    result = []
-    for report in reports:
-        response = ReportResponse.from_orm(report)
-        try:
-            if report.visualizations:
-                vis_data = json.loads(report.visualizations)
-                response.tables = [TableModel(**table) for table in vis_data.get("tables", [])]
-                response.graphs = [GraphModel(**graph) for graph in vis_data.get("graphs", [])]
-        except (json.JSONDecodeError, ValueError, TypeError) as e:
-            print(f"Error parsing visualizations for report {report.id}: {e}")
-        
-        result.append(response)
-    
-    return result
+        query += lambda s: s.where(Report.workspace_id == workspace_id)
+    
+    if cursor:
+        before_id = decode_cursor(cursor)
+        query += lambda s: s.where(Report.id < before_id)
+    
+    # Fetch one extra row to know whether another page exists
+    page_size = limit + 1
+    query += lambda s: s.order_by(Report.id.desc()).limit(page_size)
+    reports = (await db.scalars(query)).all()
+    headers = {}
+    if len(reports) > limit:
+        reports = reports[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(reports[-1].id)
+    
+    # Reports were validated on write, so serialize rows straight to JSON
+    if not include_visualizations:
+        # Summaries leave out the tables/graphs keys rather than sending empty lists
+        return ORJSONResponse([report_fields(report) for report in reports], headers=headers)
+    
+    tables, graphs = await load_raw_visualizations(db, [report.id for report in reports])
+    content = [
+        {**report_fields(report), "tables": tables[report.id], "graphs": graphs[report.id]}
+        for report in reports
+    ]
+    return ORJSONResponse(content, headers=headers)
 
 @router.get("/{report_id}", response_model=ReportResponse)
-def get_report(
+async def get_report(
     report_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get a specific report by ID."""
-    report = db.query(Report).filter(Report.id == report_id).first()
+    report = await db.get(Report, report_id)
     
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
     
     # Check if the user owns the report or has access to its workspace
     if report.user_id != current_user.id:
-        if report.workspace_id:
-            workspace = db.query(Workspace).filter(Workspace.id == report.workspace_id).first()
-            if not workspace or current_user not in workspace.members:
-                raise HTTPException(status_code=403, detail="Not authorized to access this report")
-        else:
+        if not report.workspace_id or not await user_is_member(db, report.workspace_id, current_user.id):
             raise HTTPException(status_code=403, detail="Not authorized to access this report")
     
-    # Prepare response with visualizations
-    response = ReportResponse.from_orm(report)
-    
-    # Add visualization data to response
-    try:
-        if report.visualizations:
-            vis_data = json.loads(report.visualizations)
-            response.tables = [TableModel(**table) for table in vis_data.get("tables", [])]
-            response.graphs = [GraphModel(**graph) for graph in vis_data.get("graphs", [])]
-    except (json.JSONDecodeError, ValueError, TypeError) as e:
-        print(f"Error parsing visualizations: {e}")
-    
-    return response
+    # Prepare response with visualizations, serialized straight from the rows
+    tables, graphs = await load_raw_visualizations(db, [report.id])
+    return ORJSONResponse({**report_fields(report), "tables": tables[report.id], "graphs": graphs[report.id]})
 
 @router.put("/{report_id}", response_model=ReportResponse)
-def update_report(
+async def update_report(
     report_id: int,
     report_data: ReportUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Update a report."""
-    report = db.query(Report).filter(Report.id == report_id).first()
+    report = await db.get(Report, report_id)
     
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
@@ -171,23 +279,41 @@ def update_report(
     if report.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to update this report")
     
-    # Update fields if provided
-    for key, value in report_data.dict(exclude_unset=True).items():
-        setattr(report, key, value)
-    
-    db.commit()
-    db.refresh(report)
-    
-    return report
+    # Update fields if provided, in one UPDATE that also refreshes the loaded row
+    updates = report_data.model_dump(exclude_unset=True, exclude={"tables", "graphs"})
+    if updates:
+        await db.execute(
+            update(Report)
+            .where(Report.id == report_id)
+            .values(**updates)
+            .returning(Report)
+            .execution_options(populate_existing=True)
+        )
+    
+    # Replace visualizations if provided
+    if report_data.tables is not None:
+        await db.execute(delete(ReportTable).where(ReportTable.report_id == report_id))
+        db.add_all(build_report_tables(report_data.tables, report_id))
+    if report_data.graphs is not None:
+        await db.execute(delete(ReportGraph).where(ReportGraph.report_id == report_id))
+        db.add_all(build_report_graphs(report_data.graphs, report_id))
+    
+    await db.commit()
+    
+    tables, graphs = await load_raw_visualizations(db, [report_id])
+    return ORJSONResponse({**report_fields(report), "tables": tables[report_id], "graphs": graphs[report_id]})
 
 @router.delete("/{report_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_report(
+async def delete_report(
     report_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Delete a report."""
-    report = db.query(Report).filter(Report.id == report_id).first()
+    # The delete cascades to tables and graphs, so load them up front
+    report = await db.get(
+        Report, report_id, options=[selectinload(Report.tables), selectinload(Report.graphs)]
+    )
     
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
@@ -196,15 +322,15 @@ def delete_report(
     if report.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this report")
     
-    db.delete(report)
-    db.commit()
+    await db.delete(report)
+    await db.commit()
     
     return None
 
 @router.post("/generate", response_model=ReportResponse, status_code=status.HTTP_201_CREATED)
-def generate_report(
+async def generate_report(
     data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Generate a new report based on selected documents."""
@@ -214,29 +340,35 @@ def generate_report(
     if not report_type:
         raise HTTPException(status_code=400, detail="Report type is required")
     
+    try:
+        report_type = ReportType(report_type)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid report type")
+    
     if not document_ids:
         raise HTTPException(status_code=400, detail="At least one document must be selected")
     
     # Create a title based on report type
-    title = f"{report_type.capitalize()} Report"
+    title = f"{report_type.value.capitalize()} Report"
     
     # In a real implementation, this would process the documents and generate actual content
     # For this example, we'll create a simple placeholder report
-    content = f"This is a generated {report_type} report based on {len(document_ids)} documents."
+    content = f"This is a generated {report_type.value} report based on {len(document_ids)} documents."
     
     # Create the report record
     db_report = Report(
         title=title,
-        description=f"AI-generated {report_type} report",
+        description=f"AI-generated {report_type.value} report",
         content=content,
         report_type=report_type,
-        status="completed",
+        status=ReportStatus.COMPLETED,
         pages=1,
-        user_id=current_user.id
+        user_id=current_user.id,
+        tables=[],
+        graphs=[]
     )
     
     db.add(db_report)
-    db.commit()
-    db.refresh(db_report)
+    await db.commit()
     
-    return db_report 
\ No newline at end of file
+    return ORJSONResponse(build_report_response(db_report), status_code=status.HTTP_201_CREATED) 
\ No newline at end of file
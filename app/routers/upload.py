@@ -1,23 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi.responses import FileResponse
+from sqlalchemy import select, lambda_stmt
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import os
-import shutil
-from pathlib import Path
-from datetime import datetime
+import aiofiles
+from pathlib import Path, PurePath
+from functools import lru_cache
+from ulid import ULID
 
 from ..database.database import get_db
-from ..models.models import User, Upload, Workspace
+from ..models.models import User, Upload
 from ..schemas.schemas import UploadResponse
 from ..auth.auth import get_current_active_user
+from ..services.membership import workspace_access
 from .parser import process_upload
 
-# Load environment variables
-from dotenv import load_dotenv
-load_dotenv()
 
 # Get upload directory from environment variable or use default
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
+UPLOAD_ROOT = Path(UPLOAD_DIR)
+
+# Bytes read from the request per write when saving uploads
+UPLOAD_CHUNK_SIZE = 1 << 20
 
 router = APIRouter(
     prefix="/uploads",
@@ -25,6 +30,13 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+@lru_cache(maxsize=10_000)
+def _ensure_dir(path_str: str) -> Path:
+    """Create an upload directory once per process; later calls skip the mkdir syscall."""
+    path = Path(path_str)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
 async def process_file_in_background(file_path: str):
     """Background task to process the file with the parser."""
     try:
@@ -32,53 +44,56 @@ async def process_file_in_background(file_path: str):
     except Exception as e:
         print(f"Error processing file in background: {e}")
 
+def remove_upload_file(file_path: str):
+    """Background task to delete an upload's file from disk."""
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Error deleting upload file {file_path}: {e}")
+
 @router.post("/", response_model=UploadResponse, status_code=status.HTTP_201_CREATED)
 async def upload_file(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     description: Optional[str] = Form(None),
     workspace_id: Optional[int] = Form(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Upload a file."""
     # Handle workspace-specific uploads
-    upload_dir_path = Path(UPLOAD_DIR)
-    
     if workspace_id:
-        # Check if the workspace exists and the user is a member
-        workspace = db.query(Workspace).filter(Workspace.id == workspace_id).first()
-        if not workspace:
+        # Check if the user is a member of the workspace, and if not, whether it exists
+        access = await workspace_access(db, workspace_id, current_user.id)
+        if access is None:
             raise HTTPException(status_code=404, detail="Workspace not found")
-            
-        # Check if user is a member of the workspace
-        if current_user not in workspace.members:
+        if not access:
             raise HTTPException(status_code=403, detail="Not authorized to upload to this workspace")
             
-        # Create workspace upload directory
-        upload_path = upload_dir_path / f"workspace_{workspace_id}"
+        # Use the workspace upload directory
         relative_path = Path(f"workspace_{workspace_id}")
     else:
         # Use the user-specific directory as before
-        upload_path = upload_dir_path / f"user_{current_user.id}"
         relative_path = Path(f"user_{current_user.id}")
     
     # Create directory if it doesn't exist
-    os.makedirs(upload_path, exist_ok=True)
+    upload_path = _ensure_dir(str(UPLOAD_ROOT / relative_path))
     
-    # Generate unique filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{timestamp}_{file.filename}"
+    # Generate unique filename; ULIDs sort by creation time and the original name stays in Upload.filename
+    file_extension = PurePath(file.filename).suffix
+    unique_filename = f"{ULID()}{file_extension}"
     
     # Save file to disk
     file_path = os.path.join(upload_path, unique_filename)
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Get file size
-    file_size = os.path.getsize(file_path)
+    # Stream to disk in chunks without blocking the event loop, counting bytes as we go
+    file_size = 0
+    async with aiofiles.open(file_path, "wb") as buffer:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await buffer.write(chunk)
+            file_size += len(chunk)
     
     # Create database record
     db_upload = Upload(
@@ -87,12 +102,12 @@ async def upload_file(
         file_size=file_size,
         file_type=file.content_type,
         description=description,
-        user_id=current_user.id
+        user_id=current_user.id,
+        workspace_id=workspace_id or None
     )
     
     db.add(db_upload)
-    db.commit()
-    db.refresh(db_upload)
+    await db.commit()
     
     # Trigger background processing for PDF files
     if file.filename.lower().endswith('.pdf'):
@@ -103,43 +118,42 @@ async def upload_file(
     return db_upload
 
 @router.get("/", response_model=List[UploadResponse])
-def get_uploads(
+async def get_uploads(
     skip: int = 0,
     limit: int = 100,
     workspace_id: Optional[int] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all uploads for the current user or for a specific workspace."""
-    query = db.query(Upload).filter(Upload.user_id == current_user.id)
+    user_id = current_user.id
+    query = lambda_stmt(lambda: select(Upload).where(Upload.user_id == user_id))
     
     if workspace_id:
-        # Verify workspace exists and user is a member
-        workspace = db.query(Workspace).filter(Workspace.id == workspace_id).first()
-        if not workspace:
+        # Verify user is a member, and if not, whether the workspace exists
+        access = await workspace_access(db, workspace_id, current_user.id)
+        if access is None:
             raise HTTPException(status_code=404, detail="Workspace not found")
-            
-        if current_user not in workspace.members:
+        if not access:
             raise HTTPException(status_code=403, detail="Not authorized to access this workspace")
             
-        # Filter uploads for this workspace by checking the file_path
-        workspace_path = f"workspace_{workspace_id}"
-        query = query.filter(Upload.file_path.like(f"{workspace_path}/%"))
+        # Filter uploads for this workspace
+        query += lambda s: s.where(Upload.workspace_id == workspace_id)
     else:
         # Filter for user-specific uploads only (not in workspaces)
-        user_path = f"user_{current_user.id}"
-        query = query.filter(Upload.file_path.like(f"{user_path}/%"))
+        query += lambda s: s.where(Upload.workspace_id.is_(None))
     
-    return query.offset(skip).limit(limit).all()
+    query += lambda s: s.offset(skip).limit(limit)
+    return (await db.scalars(query)).all()
 
 @router.get("/{upload_id}", response_model=UploadResponse)
-def get_upload(
+async def get_upload(
     upload_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get a specific upload by ID."""
-    upload = db.query(Upload).filter(Upload.id == upload_id).first()
+    upload = await db.get(Upload, upload_id)
     
     if not upload:
         raise HTTPException(status_code=404, detail="Upload not found")
@@ -151,13 +165,14 @@ def get_upload(
     return upload
 
 @router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_upload(
+async def delete_upload(
     upload_id: int,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Delete an upload."""
-    upload = db.query(Upload).filter(Upload.id == upload_id).first()
+    upload = await db.get(Upload, upload_id)
     
     if not upload:
         raise HTTPException(status_code=404, detail="Upload not found")
@@ -166,25 +181,55 @@ def delete_upload(
     if upload.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this upload")
     
-    # Delete file from disk
     file_path = os.path.join(UPLOAD_DIR, upload.file_path)
-    if os.path.exists(file_path):
-        os.remove(file_path)
     
     # Delete database record
-    db.delete(upload)
-    db.commit()
+    await db.delete(upload)
+    await db.commit()
+    
+    # Delete file from disk after the response is sent
+    background_tasks.add_task(remove_upload_file, file_path)
     
     return None
 
 @router.get("/download/{upload_id}")
-def download_upload(
+async def download_upload(
+    upload_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Download an upload's file."""
+    upload = await db.get(Upload, upload_id)
+    
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    
+    # Check if the user owns the upload
+    if upload.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to access this upload")
+    
+    # Stat once here and hand the result to FileResponse, which streams with sendfile
+    file_path = os.path.join(UPLOAD_DIR, upload.file_path)
+    try:
+        stat_result = os.stat(file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    return FileResponse(
+        file_path,
+        filename=upload.filename,
+        media_type=upload.file_type,
+        stat_result=stat_result
+    )
+
+@router.get("/download-url/{upload_id}")
+async def get_download_url(
     upload_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get download URL for an upload."""
-    upload = db.query(Upload).filter(Upload.id == upload_id).first()
+    upload = await db.get(Upload, upload_id)
     
     if not upload:
         raise HTTPException(status_code=404, detail="Upload not found")
@@ -193,6 +238,5 @@ def download_upload(
     if upload.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to access this upload")
     
-    # In a real app, this would generate a signed URL or serve the file
-    # For simplicity, we just return the path
-    return {"download_url": f"/files/{upload.file_path}", "filename": upload.filename} 
\ No newline at end of file
+    # For clients that need a plain URL, e.g. to hand to the browser
+    return {"download_url": f"/files/{upload.file_path}", "filename": upload.filename}
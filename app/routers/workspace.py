@@ -1,17 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, lambda_stmt
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List
 
 from ..database.database import get_db
-from ..models.models import User, Workspace
+from ..models.models import User, Workspace, workspace_users
 from ..schemas.schemas import (
     WorkspaceCreate,
     WorkspaceResponse,
     WorkspaceDetailResponse,
     WorkspaceUpdate,
-    WorkspaceAddMember
+    WorkspaceAddMember,
+    UserResponse
 )
 from ..auth.auth import get_current_active_user
+from ..services.membership import user_is_member, workspace_access
 
 router = APIRouter(
     prefix="/workspaces",
@@ -19,10 +23,33 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Members embedded in a workspace detail response; page the rest with GET /{id}/members
+DETAIL_MEMBER_LIMIT = 100
+
+async def get_members_page(db: AsyncSession, workspace_id: int, skip: int, limit: int) -> List[User]:
+    """Get one page of a workspace's members, ordered by user id."""
+    members = await db.scalars(lambda_stmt(
+        lambda: select(User)
+        .join(workspace_users, workspace_users.c.user_id == User.id)
+        .where(workspace_users.c.workspace_id == workspace_id)
+        .order_by(User.id)
+        .offset(skip)
+        .limit(limit)
+    ))
+    return members.all()
+
+async def build_workspace_detail(db: AsyncSession, workspace: Workspace) -> WorkspaceDetailResponse:
+    """Build a WorkspaceDetailResponse carrying the first page of members."""
+    members = await get_members_page(db, workspace.id, 0, DETAIL_MEMBER_LIMIT)
+    return WorkspaceDetailResponse(
+        **WorkspaceResponse.model_validate(workspace).model_dump(),
+        members=[UserResponse.model_validate(member) for member in members]
+    )
+
 @router.post("/", response_model=WorkspaceResponse, status_code=status.HTTP_201_CREATED)
-def create_workspace(
+async def create_workspace(
     workspace: WorkspaceCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Create a new workspace."""
@@ -36,48 +63,56 @@ def create_workspace(
     db_workspace.members.append(current_user)
     
     db.add(db_workspace)
-    db.commit()
-    db.refresh(db_workspace)
+    await db.commit()
     
     return db_workspace
 
 @router.get("/", response_model=List[WorkspaceResponse])
-def get_workspaces(
+async def get_workspaces(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all workspaces that the user is a member of."""
-    return current_user.workspaces[skip : skip + limit]
+    user_id = current_user.id
+    workspaces = await db.scalars(lambda_stmt(
+        lambda: select(Workspace)
+        .join(workspace_users, workspace_users.c.workspace_id == Workspace.id)
+        .where(workspace_users.c.user_id == user_id)
+        .order_by(Workspace.id)
+        .offset(skip)
+        .limit(limit)
+    ))
+    return workspaces.all()
 
 @router.get("/{workspace_id}", response_model=WorkspaceDetailResponse)
-def get_workspace(
+async def get_workspace(
     workspace_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get a specific workspace by ID."""
-    workspace = db.query(Workspace).filter(Workspace.id == workspace_id).first()
+    workspace = await db.get(Workspace, workspace_id)
     
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace not found")
         
-    # Check if the user is a member of the workspace
-    if current_user not in workspace.members:
+    # Owners are always members, so only check membership for everyone else
+    if workspace.owner_id != current_user.id and not await user_is_member(db, workspace_id, current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized to access this workspace")
         
-    return workspace
+    return await build_workspace_detail(db, workspace)
 
 @router.put("/{workspace_id}", response_model=WorkspaceResponse)
-def update_workspace(
+async def update_workspace(
     workspace_id: int,
     workspace_data: WorkspaceUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Update a workspace."""
-    workspace = db.query(Workspace).filter(Workspace.id == workspace_id).first()
+    workspace = await db.get(Workspace, workspace_id)
     
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace not found")
@@ -92,19 +127,27 @@ def update_workspace(
     if workspace_data.description is not None:
         workspace.description = workspace_data.description
         
-    db.commit()
-    db.refresh(workspace)
+    await db.commit()
     
     return workspace
 
 @router.delete("/{workspace_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_workspace(
+async def delete_workspace(
     workspace_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Delete a workspace."""
-    workspace = db.query(Workspace).filter(Workspace.id == workspace_id).first()
+    # Deleting clears the member links and detaches chats and reports, so load them up front
+    workspace = await db.get(
+        Workspace,
+        workspace_id,
+        options=[
+            selectinload(Workspace.members),
+            selectinload(Workspace.chats),
+            selectinload(Workspace.reports)
+        ]
+    )
     
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace not found")
@@ -113,20 +156,20 @@ def delete_workspace(
     if workspace.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Only the workspace owner can delete it")
         
-    db.delete(workspace)
-    db.commit()
+    await db.delete(workspace)
+    await db.commit()
     
     return None
 
 @router.post("/{workspace_id}/members", response_model=WorkspaceDetailResponse)
-def add_member_to_workspace(
+async def add_member_to_workspace(
     workspace_id: int,
     member_data: WorkspaceAddMember,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Add a member to a workspace."""
-    workspace = db.query(Workspace).filter(Workspace.id == workspace_id).first()
+    workspace = await db.get(Workspace, workspace_id)
     
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace not found")
@@ -136,30 +179,29 @@ def add_member_to_workspace(
         raise HTTPException(status_code=403, detail="Only the workspace owner can add members")
         
     # Get the user to add
-    user_to_add = db.query(User).filter(User.id == member_data.user_id).first()
+    user_to_add = await db.get(User, member_data.user_id)
     if not user_to_add:
         raise HTTPException(status_code=404, detail="User not found")
         
     # Check if the user is already a member
-    if user_to_add in workspace.members:
+    if await user_is_member(db, workspace_id, user_to_add.id):
         raise HTTPException(status_code=400, detail="User is already a member of this workspace")
         
     # Add the user to the workspace
-    workspace.members.append(user_to_add)
-    db.commit()
-    db.refresh(workspace)
+    await db.execute(workspace_users.insert().values(workspace_id=workspace_id, user_id=user_to_add.id))
+    await db.commit()
     
-    return workspace
+    return await build_workspace_detail(db, workspace)
 
 @router.delete("/{workspace_id}/members/{user_id}", response_model=WorkspaceDetailResponse)
-def remove_member_from_workspace(
+async def remove_member_from_workspace(
     workspace_id: int,
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Remove a member from a workspace."""
-    workspace = db.query(Workspace).filter(Workspace.id == workspace_id).first()
+    workspace = await db.get(Workspace, workspace_id)
     
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace not found")
@@ -173,17 +215,39 @@ def remove_member_from_workspace(
         raise HTTPException(status_code=400, detail="Cannot remove the workspace owner")
         
     # Get the user to remove
-    user_to_remove = db.query(User).filter(User.id == user_id).first()
+    user_to_remove = await db.get(User, user_id)
     if not user_to_remove:
         raise HTTPException(status_code=404, detail="User not found")
         
     # Check if the user is a member
-    if user_to_remove not in workspace.members:
+    if not await user_is_member(db, workspace_id, user_to_remove.id):
         raise HTTPException(status_code=400, detail="User is not a member of this workspace")
         
     # Remove the user from the workspace
-    workspace.members.remove(user_to_remove)
-    db.commit()
-    db.refresh(workspace)
+    await db.execute(
+        workspace_users.delete().where(
+            workspace_users.c.workspace_id == workspace_id,
+            workspace_users.c.user_id == user_to_remove.id
+        )
+    )
+    await db.commit()
+    
+    return await build_workspace_detail(db, workspace) 
+
+@router.get("/{workspace_id}/members", response_model=List[UserResponse])
+async def get_workspace_members(
+    workspace_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get a page of a workspace's members."""
+    # Check if the user is a member of the workspace, and if not, whether it exists
+    access = await workspace_access(db, workspace_id, current_user.id)
+    if access is None:
+        raise HTTPException(status_code=404, detail="Workspace not found")
+    if not access:
+        raise HTTPException(status_code=403, detail="Not authorized to access this workspace")
     
-    return workspace 
\ No newline at end of file
+    return await get_members_page(db, workspace_id, skip, limit)
@@ -1,9 +1,9 @@
-from pydantic import BaseModel, EmailStr, Field, validator
-from typing import List, Optional, Dict, Union, Any
+from pydantic import BaseModel, ConfigDict, EmailStr
+from typing import List, Dict, Any, Optional, Union, Literal
 from datetime import datetime
+import msgspec
 
-# Add the imports for visualization models
-from typing import List, Dict, Any, Optional, Union, Literal
+from ..models.enums import ReportType, ReportStatus
 
 # User schemas
 class UserBase(BaseModel):
@@ -22,8 +22,7 @@ class UserResponse(UserBase):
     is_active: bool
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Token schemas
 class Token(BaseModel):
@@ -55,14 +54,12 @@ class WorkspaceResponse(WorkspaceBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class WorkspaceDetailResponse(WorkspaceResponse):
     members: List[UserResponse]
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Chat schemas
 class ChatBase(BaseModel):
@@ -78,8 +75,7 @@ class ChatResponse(ChatBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Message schemas
 class MessageBase(BaseModel):
@@ -95,8 +91,7 @@ class MessageResponse(MessageBase):
     user_id: int
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Visualization schemas
 class TableModel(BaseModel):
@@ -124,8 +119,8 @@ class ReportBase(BaseModel):
     title: str
     description: Optional[str] = None
     content: str
-    report_type: str
-    status: str = "Draft"
+    report_type: ReportType
+    status: ReportStatus = ReportStatus.DRAFT
     pages: int = 0
     workspace_id: Optional[int] = None
 
@@ -137,8 +132,8 @@ class ReportUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
     content: Optional[str] = None
-    report_type: Optional[str] = None
-    status: Optional[str] = None
+    report_type: Optional[ReportType] = None
+    status: Optional[ReportStatus] = None
     pages: Optional[int] = None
     tables: Optional[List[TableModel]] = None
     graphs: Optional[List[GraphModel]] = None
@@ -151,8 +146,7 @@ class ReportResponse(ReportBase):
     tables: List[TableModel] = []
     graphs: List[GraphModel] = []
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Upload schemas
 class UploadResponse(BaseModel):
@@ -163,15 +157,43 @@ class UploadResponse(BaseModel):
     file_type: str
     description: Optional[str] = None
     user_id: int
+    workspace_id: Optional[int] = None
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+# WebSocket message schemas; msgspec Structs since they are decoded/encoded on every frame
+class VisualizationOptions(msgspec.Struct):
+    include_tables: bool = True
+    include_graphs: bool = True
+    max_tables: int = 5
+    max_graphs: int = 3
+
+class WebSocketChatFrame(msgspec.Struct):
+    """A chat message sent by the client; other fields in the frame are ignored."""
+    content: str = ""
+    visualization_options: VisualizationOptions = msgspec.field(default_factory=VisualizationOptions)
+
+class WebSocketMessageData(msgspec.Struct, omit_defaults=True):
+    """A stored chat message as broadcast to clients; visualizations only on AI answers."""
+    id: int
+    uuid: str
+    user: str
+    format: str
+    content: str
+    is_from_user: bool
+    user_id: int
+    chat_id: int
+    created_at: datetime
+    visualizations: Optional[Dict[str, Any]] = None
 
-# WebSocket message schemas
-class WebSocketMessage(BaseModel):
+class WebSocketMessage(msgspec.Struct, omit_defaults=True):
+    """A message broadcast to the chat's clients."""
     type: str
-    data: Dict[str, Union[str, int, bool, dict]]
+    message_type: str
+    data: WebSocketMessageData
+    session_id: Optional[str] = None
+    workspace_id: Optional[int] = None
 
 class QueryResponse(BaseModel):
     status: str
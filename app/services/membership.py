@@ -0,0 +1,36 @@
+from sqlalchemy import select, exists, and_, lambda_stmt
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from ..models.models import Workspace, workspace_users
+
+async def user_is_member(db: AsyncSession, workspace_id: int, user_id: int) -> bool:
+    """Check workspace membership with an indexed EXISTS instead of loading all members."""
+    return await db.scalar(lambda_stmt(
+        lambda: select(
+            exists().where(
+                workspace_users.c.workspace_id == workspace_id,
+                workspace_users.c.user_id == user_id
+            )
+        )
+    ))
+
+async def workspace_access(db: AsyncSession, workspace_id: int, user_id: int) -> Optional[bool]:
+    """
+    Check that a workspace exists and the user is a member, in a single query.
+    
+    Returns None when the workspace does not exist, otherwise whether the
+    user is a member.
+    """
+    row = (await db.execute(lambda_stmt(
+        lambda: select(Workspace.id, workspace_users.c.user_id)
+        .outerjoin(
+            workspace_users,
+            and_(workspace_users.c.workspace_id == Workspace.id, workspace_users.c.user_id == user_id)
+        )
+        .where(Workspace.id == workspace_id)
+    ))).first()
+    
+    if row is None:
+        return None
+    return row.user_id is not None
@@ -0,0 +1,17 @@
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from typing import Any
+import orjson
+
+def pydantic_default(obj: Any) -> Any:
+    """Let orjson serialize pydantic models it meets inside plain containers."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson instead of the stdlib json module."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=pydantic_default, option=orjson.OPT_SERIALIZE_NUMPY)
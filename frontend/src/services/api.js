@@ -333,7 +333,7 @@ export const uploadApi = {
 
   // Get download URL
   getDownloadUrl: async (id) => {
-    const data = await fetchWithAuth(`/uploads/download/${id}`);
+    const data = await fetchWithAuth(`/uploads/download-url/${id}`);
     return `${API_BASE_URL}${data.download_url}`;
   },
 };
@@ -351,6 +351,9 @@ export const reportsApi = {
       queryParams.push(`workspace_id=${workspaceId}`);
     }
 
+    // The list renders each report's tables and graphs
+    queryParams.push('include=visualizations');
+
     const queryString = queryParams.join('&');
     const url = queryString ? `/reports?${queryString}` : '/reports';
     return fetchWithAuth(url);
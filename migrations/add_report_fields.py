@@ -3,7 +3,8 @@ import os
 
 def migrate():
     """
-    Add workspace_id and visualizations columns to the reports table
+    Add workspace_id column to the reports table
+    (visualizations now live in report_tables/report_graphs, see move_report_visualizations)
     """
     # Get the path to the database file
     db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.db")
@@ -30,13 +31,6 @@ def migrate():
         else:
             print("workspace_id column already exists.")
         
-        # Add visualizations column if it doesn't exist
-        if "visualizations" not in columns:
-            print("Adding visualizations column to reports table...")
-            cursor.execute("ALTER TABLE reports ADD COLUMN visualizations TEXT")
-        else:
-            print("visualizations column already exists.")
-        
         # Commit the changes
         conn.commit()
         print("Migration completed successfully.")
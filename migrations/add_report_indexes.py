@@ -0,0 +1,40 @@
+import sqlite3
+import os
+
+def migrate():
+    """
+    Add the composite index used to filter reports
+    """
+    # Get the path to the database file
+    db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.db")
+    
+    print(f"Database path: {db_path}")
+    
+    if not os.path.exists(db_path):
+        print(f"Error: Database file {db_path} does not exist.")
+        return
+    
+    conn = None
+    try:
+        # Connect to the database
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        # Indexes are created by create_all on fresh databases; add them to existing ones
+        print("Adding report filter index...")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_reports_user_type_status_ws "
+            "ON reports (user_id, report_type, status, workspace_id)"
+        )
+        
+        # Commit the changes
+        conn.commit()
+        print("Migration completed successfully.")
+    except sqlite3.Error as e:
+        print(f"SQLite error: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    migrate()
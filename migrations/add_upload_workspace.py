@@ -0,0 +1,53 @@
+import sqlite3
+import os
+
+def migrate():
+    """
+    Add workspace_id column to the uploads table, backfilled from the file path prefix
+    """
+    # Get the path to the database file
+    db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.db")
+    
+    print(f"Database path: {db_path}")
+    
+    if not os.path.exists(db_path):
+        print(f"Error: Database file {db_path} does not exist.")
+        return
+    
+    conn = None
+    try:
+        # Connect to the database
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        # Check if the column already exists
+        cursor.execute("PRAGMA table_info(uploads)")
+        columns = [col[1] for col in cursor.fetchall()]
+        
+        if "workspace_id" not in columns:
+            print("Adding workspace_id column to uploads table...")
+            cursor.execute("ALTER TABLE uploads ADD COLUMN workspace_id INTEGER REFERENCES workspaces(id)")
+            
+            # Workspace uploads were stored under workspace_<id>/<filename>
+            print("Backfilling upload workspace_id from file paths...")
+            cursor.execute(
+                "UPDATE uploads "
+                "SET workspace_id = CAST(substr(file_path, 11, instr(file_path, '/') - 11) AS INTEGER) "
+                "WHERE file_path LIKE 'workspace\\_%/%' ESCAPE '\\'"
+            )
+        else:
+            print("workspace_id column already exists.")
+        
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_uploads_workspace_id ON uploads (workspace_id)")
+        
+        # Commit the changes
+        conn.commit()
+        print("Migration completed successfully.")
+    except sqlite3.Error as e:
+        print(f"SQLite error: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,13 @@
+def migrate():
+    """
+    Create any tables from the models that do not exist yet (baseline schema)
+    """
+    from app.database.database import engine
+    from app.models import models
+    
+    print("Creating missing tables...")
+    models.Base.metadata.create_all(bind=engine)
+    print("Migration completed successfully.")
+
+if __name__ == "__main__":
+    migrate()
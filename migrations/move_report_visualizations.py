@@ -0,0 +1,71 @@
+import sqlite3
+import json
+import os
+
+def migrate():
+    """
+    Move report visualizations from the reports.visualizations JSON column
+    into the report_tables and report_graphs tables, then drop the column
+    """
+    # Get the path to the database file
+    db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.db")
+    
+    print(f"Database path: {db_path}")
+    
+    if not os.path.exists(db_path):
+        print(f"Error: Database file {db_path} does not exist.")
+        return
+    
+    conn = None
+    try:
+        # Connect to the database
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        # Nothing to do once the column is gone
+        cursor.execute("PRAGMA table_info(reports)")
+        columns = [col[1] for col in cursor.fetchall()]
+        if "visualizations" not in columns:
+            print("visualizations column already moved.")
+            return
+        
+        print("Moving report visualizations into report_tables and report_graphs...")
+        cursor.execute("SELECT id, visualizations FROM reports WHERE visualizations IS NOT NULL")
+        for report_id, visualizations in cursor.fetchall():
+            try:
+                vis_data = json.loads(visualizations)
+            except (json.JSONDecodeError, TypeError) as e:
+                print(f"Skipping visualizations for report {report_id}: {e}")
+                continue
+            
+            for position, table in enumerate(vis_data.get("tables", [])):
+                cursor.execute(
+                    "INSERT INTO report_tables (report_id, position, title, description, data) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (report_id, position, table.get("title"), table.get("description"),
+                     json.dumps(table.get("data", [])))
+                )
+            
+            for position, graph in enumerate(vis_data.get("graphs", [])):
+                cursor.execute(
+                    "INSERT INTO report_graphs (report_id, position, type, title, description, labels, datasets, x_axis, y_axis) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (report_id, position, graph.get("type"), graph.get("title"), graph.get("description"),
+                     json.dumps(graph.get("labels", [])), json.dumps(graph.get("datasets", [])),
+                     graph.get("xAxis"), graph.get("yAxis"))
+                )
+        
+        # Requires SQLite 3.35+
+        cursor.execute("ALTER TABLE reports DROP COLUMN visualizations")
+        
+        # Commit the changes
+        conn.commit()
+        print("Migration completed successfully.")
+    except sqlite3.Error as e:
+        print(f"SQLite error: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    migrate()
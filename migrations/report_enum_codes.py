@@ -0,0 +1,72 @@
+import sqlite3
+import os
+
+def migrate():
+    """
+    Convert reports.report_type and reports.status from free-form text to SMALLINT enum codes
+    """
+    from app.models.enums import ReportType, ReportStatus, enum_codes
+    
+    # Get the path to the database file
+    db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.db")
+    
+    print(f"Database path: {db_path}")
+    
+    if not os.path.exists(db_path):
+        print(f"Error: Database file {db_path} does not exist.")
+        return
+    
+    conn = None
+    try:
+        # Connect to the database
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        # Nothing to do once the columns hold codes
+        cursor.execute("PRAGMA table_info(reports)")
+        column_types = {col[1]: col[2].upper() for col in cursor.fetchall()}
+        if column_types.get("report_type") == "SMALLINT" and column_types.get("status") == "SMALLINT":
+            print("report_type and status already stored as codes.")
+            return
+        
+        # SQLite cannot drop an indexed column
+        cursor.execute("DROP INDEX IF EXISTS ix_reports_report_type")
+        cursor.execute("DROP INDEX IF EXISTS ix_reports_user_type_status_ws")
+        
+        # Unknown values fall back to OTHER / DRAFT
+        for column, enum_class, fallback in (
+            ("report_type", ReportType, ReportType.OTHER),
+            ("status", ReportStatus, ReportStatus.DRAFT)
+        ):
+            if column_types.get(column) == "SMALLINT":
+                continue
+            
+            print(f"Converting reports.{column} to codes...")
+            codes = enum_codes(enum_class)
+            cases = " ".join(f"WHEN '{member.value.lower()}' THEN {code}" for member, code in codes.items())
+            cursor.execute(f"ALTER TABLE reports ADD COLUMN {column}_code SMALLINT")
+            cursor.execute(
+                f"UPDATE reports SET {column}_code = CASE lower({column}) {cases} ELSE {codes[fallback]} END "
+                f"WHERE {column} IS NOT NULL"
+            )
+            # Requires SQLite 3.35+
+            cursor.execute(f"ALTER TABLE reports DROP COLUMN {column}")
+            cursor.execute(f"ALTER TABLE reports RENAME COLUMN {column}_code TO {column}")
+        
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_reports_report_type ON reports (report_type)")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_reports_user_type_status_ws "
+            "ON reports (user_id, report_type, status, workspace_id)"
+        )
+        
+        # Commit the changes
+        conn.commit()
+        print("Migration completed successfully.")
+    except sqlite3.Error as e:
+        print(f"SQLite error: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -14,12 +14,16 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
 from src.prompts import (MISSING_INFO_CHECKER_PROMPT, RESPONSE_MERGER_PROMPT, 
                          QUERY_DECOMPOSITION_PROMPT, STOCK_TOOL_DESCRIPTION,
-                         TABLE_AND_GRAPH_EXTRACTION_PROMPT)
+                         TABLE_AND_GRAPH_EXTRACTION_PROMPT, REPORT_CLEANUP_PROMPT)
 from src.logger import info, error, log_request, log_response, warning, get_logger, log_agent_output
 import uuid
 import json
+import re
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from typing import List, Dict, Any
 from langchain.tools import Tool
 
@@ -52,6 +56,20 @@ gpt4_llm = ChatOpenAI(model="gpt-4-turbo", temperature=0)
 parser = StrOutputParser()
 json_parser = JsonOutputParser()
 
+# LLM chains, built once and shared by every request
+decomposition_chain = ChatPromptTemplate.from_messages([
+    ("system", QUERY_DECOMPOSITION_PROMPT)
+]) | gpt4_llm | json_parser
+missing_info_chain = ChatPromptTemplate.from_messages([
+    ("system", MISSING_INFO_CHECKER_PROMPT)
+]) | gpt4_llm | parser
+missing_info_with_answered_chain = ChatPromptTemplate.from_messages([
+    ("system", MISSING_INFO_CHECKER_PROMPT + "\n\nThe following parts have already been answered in previous responses, so don't include these:\n{answered_parts}")
+]) | gpt4_llm | parser
+merger_chain = ChatPromptTemplate.from_template(RESPONSE_MERGER_PROMPT) | gpt4_llm | parser
+cleanup_chain = ChatPromptTemplate.from_template(REPORT_CLEANUP_PROMPT) | gpt4_llm | parser
+visualization_chain = ChatPromptTemplate.from_template(TABLE_AND_GRAPH_EXTRACTION_PROMPT) | gpt4_llm | json_parser
+
 def decompose_query(original_query: str) -> List[Dict[str, Any]]:
     """
     Decompose a complex query into smaller, more focused sub-queries.
@@ -72,16 +90,9 @@ def decompose_query(original_query: str) -> List[Dict[str, Any]]:
     """
     info(f"Decomposing complex query: '{original_query}'")
     
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", QUERY_DECOMPOSITION_PROMPT)
-    ])
-    
-    # Using JsonOutputParser to get structured output
-    chain = prompt | gpt4_llm | json_parser
-    
     try:
         # Parse the original query into sub-queries with metadata
-        result = chain.invoke({"query": original_query})
+        result = decomposition_chain.invoke({"query": original_query})
         
         if not result or "sub_queries" not in result:
             # If decomposition fails, return the original as a single query
@@ -164,23 +175,20 @@ def check_missing_parts(original_query: str, expanded_query: str, agent_response
     if qa_pairs and len(qa_pairs) > 0:
         qa_pairs_text = "\n\n".join([f"Q: {q}\nA: {a}" for q, a in qa_pairs])
     
+    inputs = {
+        "original_query": original_query,
+        "qa_pairs": qa_pairs_text,
+        "agent_response": agent_response
+    }
+    
     # Add context about already answered parts if available
-    system_prompt = MISSING_INFO_CHECKER_PROMPT
+    chain = missing_info_chain
     if answered_parts and len(answered_parts) > 0:
-        answered_str = "\n".join([f"- {part}" for part in answered_parts])
-        system_prompt += f"\n\nThe following parts have already been answered in previous responses, so don't include these:\n{answered_str}"
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt)
-    ])
-    chain = prompt | gpt4_llm | parser
+        inputs["answered_parts"] = "\n".join([f"- {part}" for part in answered_parts])
+        chain = missing_info_with_answered_chain
     
     try:
-        missing_info = chain.invoke({
-            "original_query": original_query,
-            "qa_pairs": qa_pairs_text,
-            "agent_response": agent_response
-        })
+        missing_info = chain.invoke(inputs)
 
         if "none" in missing_info.lower():
             info("No missing parts detected")
@@ -193,97 +201,196 @@ def check_missing_parts(original_query: str, expanded_query: str, agent_response
         error(f"Error checking for missing parts: {str(e)}")
         return []
 
+# Company names recognised in stock queries and the ticker each one maps to
+COMPANY_TICKERS = {
+    "apple": "AAPL",
+    "microsoft": "MSFT",
+    "google": "GOOGL",
+    "alphabet": "GOOGL",
+    "amazon": "AMZN",
+    "tesla": "TSLA",
+    "meta": "META",
+    "facebook": "META",
+    "netflix": "NFLX",
+    "nvidia": "NVDA",
+    "walmart": "WMT",
+    "jpmorgan": "JPM",
+    "jp morgan": "JPM",
+    "bank of america": "BAC",
+    "disney": "DIS",
+    "coca cola": "KO",
+    "coca-cola": "KO",
+    "intel": "INTC",
+    "amd": "AMD",
+    "advanced micro devices": "AMD"
+}
+
+# Matches any company name as a whole word in one pass; longer names are tried first
+COMPANY_NAME_RE = re.compile(
+    r"\b(" + "|".join(re.escape(name) for name in sorted(COMPANY_TICKERS, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
+
+# Terms that mark a query as being about stock metrics; plurals and derived words such as "shareholders" also match
+STOCK_TERM_RE = re.compile(
+    r"\b(?:stock|price|share|market cap|p/e|eps|dividend|ticker|valuation|trading at|worth)",
+    re.IGNORECASE
+)
+
+# Upper-case words that may be tickers; only those in COMPANY_TICKERS are counted
+TICKER_RE = re.compile(r"\b[A-Z]{1,5}\b")
+KNOWN_TICKERS = frozenset(COMPANY_TICKERS.values())
+
+def mentioned_tickers(text: str) -> set:
+    """Find the known companies a text refers to, by name or by ticker"""
+    tickers = {COMPANY_TICKERS[name.lower()] for name in COMPANY_NAME_RE.findall(text)}
+    tickers.update(KNOWN_TICKERS.intersection(TICKER_RE.findall(text)))
+    return tickers
+
+def prepare_query(query: str) -> tuple:
+    """Add a ticker hint to stock queries; returns the query to run and whether it is a stock query"""
+    # Pre-process stock-related queries to help with company name to ticker conversion
+    is_stock_query = STOCK_TERM_RE.search(query) is not None
+    
+    # For stock queries, add a hint to use the stock tool with the appropriate ticker
+    if is_stock_query:
+        match = COMPANY_NAME_RE.search(query)
+        if match:
+            # Modify the query to include the ticker for clarity
+            ticker = COMPANY_TICKERS[match.group(1).lower()]
+            enhanced_query = f"{query} (Use the Stock Info Tool with ticker '{ticker}' to answer this query)"
+            info(f"Enhanced stock query with ticker info: '{enhanced_query}'")
+            query = enhanced_query
+    
+    return query, is_stock_query
+
+def agent_response(query: str, result, is_stock_query: bool) -> tuple:
+    """Extract and log the agent's answer, returning the question-answer pair"""
+    response = result["output"] if isinstance(result, dict) else str(result)
+    
+    # Log the agent output for debugging
+    log_agent_output(
+        agent_name="LangChain",
+        input_text=query,
+        output_text=response,
+        metadata={"is_stock_query": is_stock_query}
+    )
+    
+    info(f"Got response ({len(response)} chars): {response[:100]}...")
+    return (query, response)
+
+# Recent agent answers, reused when the same sub-query comes up again. Entries
+# expire quickly because most answers quote live market data.
+QUERY_CACHE_SIZE = 10000
+QUERY_CACHE_TTL = 300
+_query_cache = OrderedDict()
+_query_cache_lock = threading.Lock()
+
+def _query_cache_key(query: str) -> str:
+    """Hash a query after normalising case and whitespace"""
+    return hashlib.blake2b(" ".join(query.lower().split()).encode(), digest_size=16).hexdigest()
+
+def cached_answer(query: str):
+    """Return a fresh cached answer to the query, or None"""
+    key = _query_cache_key(query)
+    with _query_cache_lock:
+        entry = _query_cache.get(key)
+        if entry is None:
+            return None
+        stored_at, answer = entry
+        if time.monotonic() - stored_at > QUERY_CACHE_TTL:
+            del _query_cache[key]
+            return None
+        _query_cache.move_to_end(key)
+    
+    info(f"Using cached answer for query: '{query}'")
+    return answer
+
+def cache_answer(query: str, answer: str) -> None:
+    """Store an answer, evicting the least recently used entry when the cache is full"""
+    key = _query_cache_key(query)
+    with _query_cache_lock:
+        _query_cache[key] = (time.monotonic(), answer)
+        _query_cache.move_to_end(key)
+        if len(_query_cache) > QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+
 def process_query(agent, query: str) -> tuple:
     """Process a single query through the agent and return the question-answer pair"""
     try:
         info(f"Processing query: '{query}'")
-        
-        # Pre-process stock-related queries to help with company name to ticker conversion
-        lower_query = query.lower()
-        is_stock_query = any(term in lower_query for term in [
-            "stock", "price", "share", "market cap", "p/e", "eps", "dividend", "ticker",
-            "stock price", "shares", "valuation", "trading at", "worth"
-        ])
-        
-        company_name_mapping = {
-            "apple": "AAPL",
-            "microsoft": "MSFT",
-            "google": "GOOGL",
-            "alphabet": "GOOGL",
-            "amazon": "AMZN",
-            "tesla": "TSLA",
-            "meta": "META",
-            "facebook": "META",
-            "netflix": "NFLX",
-            "nvidia": "NVDA",
-            "walmart": "WMT",
-            "jpmorgan": "JPM",
-            "jp morgan": "JPM",
-            "bank of america": "BAC",
-            "disney": "DIS",
-            "coca cola": "KO",
-            "coca-cola": "KO",
-            "intel": "INTC",
-            "amd": "AMD",
-            "advanced micro devices": "AMD"
-        }
-        
-        # For stock queries, add a hint to use the stock tool with the appropriate ticker
-        if is_stock_query:
-            for company, ticker in company_name_mapping.items():
-                if company in lower_query:
-                    # Modify the query to include the ticker for clarity
-                    enhanced_query = f"{query} (Use the Stock Info Tool with ticker '{ticker}' to answer this query)"
-                    info(f"Enhanced stock query with ticker info: '{enhanced_query}'")
-                    query = enhanced_query
-                    break
+        query, is_stock_query = prepare_query(query)
+        answer = cached_answer(query)
+        if answer is not None:
+            return (query, answer)
         
         # Execute the agent
         result = agent.invoke(query)
-        response = result["output"] if isinstance(result, dict) else str(result)
-        
-        # Log the agent output for debugging
-        log_agent_output(
-            agent_name="LangChain",
-            input_text=query,
-            output_text=response,
-            metadata={"is_stock_query": is_stock_query}
-        )
+        qa_pair = agent_response(query, result, is_stock_query)
+        cache_answer(*qa_pair)
+        return qa_pair
+    except Exception as e:
+        error(f"Error processing query: {str(e)}")
+        return (query, f"Error processing your request. {str(e)}")
+
+async def aprocess_query(agent, query: str, semaphore: asyncio.Semaphore) -> tuple:
+    """Async version of process_query; the semaphore bounds how many agent runs are in flight"""
+    try:
+        info(f"Processing query: '{query}'")
+        query, is_stock_query = prepare_query(query)
+        answer = cached_answer(query)
+        if answer is not None:
+            return (query, answer)
         
-        info(f"Got response ({len(response)} chars): {response[:100]}...")
-        return (query, response)
+        # Execute the agent
+        async with semaphore:
+            result = await agent.ainvoke(query)
+        qa_pair = agent_response(query, result, is_stock_query)
+        cache_answer(*qa_pair)
+        return qa_pair
     except Exception as e:
         error(f"Error processing query: {str(e)}")
         return (query, f"Error processing your request. {str(e)}")
 
-def process_queries_in_parallel(agent, queries: list, max_workers: int = 4) -> list:
-    """Process multiple queries in parallel using a thread pool"""
-    results = []
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all tasks
-        future_to_query = {executor.submit(process_query, agent, query): query for query in queries}
-        
-        # Process results as they complete
-        for future in future_to_query:
-            try:
-                results.append(future.result())
-            except Exception as e:
-                query = future_to_query[future]
-                error(f"Error in parallel processing for query '{query}': {str(e)}")
-                results.append((query, f"Error processing your request. {str(e)}"))
-    
-    # Log the parallel processing results
-    parallel_results_log = "\n".join([f"Query: {q}\nResponse: {r[:200]}..." for q, r in results])
-    log_agent_output(
-        agent_name="ParallelProcessing",
-        input_text=str(queries),
-        output_text=parallel_results_log,
-        metadata={"num_queries": len(queries), "max_workers": max_workers}
-    )
+# Event loop shared by all async agent runs. Keeping one loop alive lets the
+# OpenAI client's async connection pool be reused between calls.
+_loop = None
+_loop_lock = threading.Lock()
+
+def run_async(coro):
+    """Run a coroutine on the shared event loop from synchronous code and wait for its result"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="flow-event-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+async def aprocess_queries_in_parallel(agent, queries: list, max_workers: int = 4) -> list:
+    """Process multiple queries concurrently, with at most max_workers agent runs in flight"""
+    semaphore = asyncio.Semaphore(max_workers)
+    
+    async def run(index, query):
+        return index, await aprocess_query(agent, query, semaphore)
+    
+    # Log each answer as soon as it arrives; results are still returned in query order
+    results = [None] * len(queries)
+    for next_result in asyncio.as_completed([run(i, query) for i, query in enumerate(queries)]):
+        index, (query, response) = await next_result
+        results[index] = (query, response)
+        log_agent_output(
+            agent_name="ParallelProcessing",
+            input_text=query,
+            output_text=f"{response[:200]}...",
+            metadata={"index": index, "num_queries": len(queries), "max_workers": max_workers}
+        )
     
     return results
 
+def process_queries_in_parallel(agent, queries: list, max_workers: int = 4) -> list:
+    """Process multiple queries in parallel on the shared event loop"""
+    return run_async(aprocess_queries_in_parallel(agent, queries, max_workers))
+
 def merge_responses(original_query: str, expanded_query: str, qa_pairs: List, metadata: dict) -> str:
     """
     Merge multiple question-answer pairs into a coherent response.
@@ -350,15 +457,9 @@ def merge_responses(original_query: str, expanded_query: str, qa_pairs: List, me
     qa_text = "\n\n".join(formatted_pairs)
     info(f"Created formatted QA text of length {len(qa_text)}")
     
-    # Create prompt for merging responses
-    info("Creating merger prompt and chain")
-    prompt = ChatPromptTemplate.from_template(RESPONSE_MERGER_PROMPT)
-    
-    chain = prompt | gpt4_llm | parser
-    
     try:
         info("Invoking response merger LLM chain")
-        merged_response = chain.invoke({
+        merged_response = merger_chain.invoke({
             "original_query": original_query,
             "qa_pairs": qa_text
         })
@@ -408,7 +509,8 @@ def merge_responses(original_query: str, expanded_query: str, qa_pairs: List, me
 def post_process_response(response: str, original_query: str) -> str:
     """
     Post-process the response to ensure no question-answer format remains
-    and to remove references to companies not in the original query
+    and to remove references to companies not in the original query.
+    Both fixes are made by a single LLM pass.
     
     Args:
         response: The merged response from the LLM
@@ -424,123 +526,54 @@ def post_process_response(response: str, original_query: str) -> str:
     ]
     
     has_qa_format = any(indicator in response for indicator in qa_indicators)
-    
-    # If Q&A format is detected, reprocess with a stronger prompt
     if has_qa_format:
-        info("Q&A format detected in merged response, applying stricter reformatting")
-        
-        # Create a stronger prompt specifically for reformatting
-        reformat_prompt = """
-        You are a financial report editor. The text below contains information in a question-answer format,
-        which is NOT acceptable for our final report. 
-        
-        Your task:
-        1. Convert ALL question-answer pairs into flowing narrative paragraphs or tables
-        2. COMPLETELY REMOVE any trace of the Q&A format
-        3. Preserve ALL financial data and metrics
-        4. Group related information together
-        5. Use appropriate section headings
-        
-        Text to reformat:
-        {text}
-        
-        Reformatted report (with NO question-answer format):
-        """
-        
-        prompt = ChatPromptTemplate.from_template(reformat_prompt)
-        reformat_chain = prompt | gpt4_llm | parser
-        
-        try:
-            # Log the reformatting attempt
-            log_agent_output(
-                agent_name="ResponseReformatter_Input",
-                input_text=response,
-                output_text="",
-                metadata={"has_qa_format": True}
-            )
-            
-            reformatted_response = reformat_chain.invoke({"text": response})
-            info("Successfully reformatted response to remove Q&A format")
-            
-            # Log the reformatting results
-            log_agent_output(
-                agent_name="ResponseReformatter_Output",
-                input_text="",
-                output_text=reformatted_response,
-                metadata={"success": True}
-            )
-            
-            response = reformatted_response
-        except Exception as e:
-            error(f"Error in post-processing: {str(e)}")
-            
-            # Manual fallback cleanup if LLM call fails
-            for indicator in qa_indicators:
-                response = response.replace(indicator, "")
-            
-            # Log the reformatting failure
-            log_agent_output(
-                agent_name="ResponseReformatter_Fallback",
-                input_text="",
-                output_text=f"Error: {str(e)}\nFalling back to manual replacement",
-                metadata={"success": False, "error": str(e)}
-            )
-    
-    # Additional check to ensure we're not presenting data about companies that weren't part of the original query
-    # This prevents hallucinations where model discusses Microsoft when asked about Apple, etc.
-    verification_prompt = """
-    You are a financial data verification specialist. Review the financial report below and ensure it ONLY contains 
-    information about the company or companies explicitly asked about in the original query.
+        info("Q&A format detected in merged response, reformatting it during cleanup")
     
-    Original query: {original_query}
-    
-    Report to verify:
-    {text}
-    
-    Your task:
-    1. If the report contains data about companies NOT mentioned in the original query, remove those sections COMPLETELY
-    2. If the report attributes data from one company (e.g., Apple) to another company (e.g., Microsoft), correct those attributions
-    3. Make NO OTHER changes to the report content
-    4. Return the corrected report with proper company attributions
-    
-    Corrected report:
-    """
+    # Only ask the LLM to verify companies if the response names one the query didn't
+    extra_tickers = mentioned_tickers(response) - mentioned_tickers(original_query)
+    if not has_qa_format and not extra_tickers:
+        info("No Q&A format or unrequested companies found, skipping response cleanup")
+        return response
+    if extra_tickers:
+        info(f"Response mentions companies not in the query ({', '.join(sorted(extra_tickers))}), verifying it")
     
     try:
-        # Log the verification input
+        # Log the cleanup input
         log_agent_output(
-            agent_name="CompanyVerifier_Input",
-            input_text=f"Query: {original_query}\n\nResponse to verify: {response[:500]}...",
+            agent_name="ResponseCleanup_Input",
+            input_text=f"Query: {original_query}\n\nResponse to clean up: {response[:500]}...",
             output_text="",
-            metadata={}
+            metadata={"has_qa_format": has_qa_format}
         )
         
-        verify_prompt = ChatPromptTemplate.from_template(verification_prompt)
-        verify_chain = verify_prompt | gpt4_llm | parser
-        
-        verified_response = verify_chain.invoke({
+        cleaned_response = cleanup_chain.invoke({
             "original_query": original_query,
             "text": response
         })
         
-        # Log the verification result
+        # Log the cleanup result
         log_agent_output(
-            agent_name="CompanyVerifier_Output",
+            agent_name="ResponseCleanup_Output",
             input_text="",
-            output_text=verified_response[:500] + "...",
+            output_text=cleaned_response[:500] + "...",
             metadata={"success": True}
         )
         
-        info("Successfully verified company references in response")
-        return verified_response
+        info("Successfully reformatted and verified company references in response")
+        return cleaned_response
     except Exception as e:
-        error(f"Error in company verification: {str(e)}")
+        error(f"Error in post-processing: {str(e)}")
         
-        # Log the verification failure
+        # Manual fallback cleanup if LLM call fails
+        if has_qa_format:
+            for indicator in qa_indicators:
+                response = response.replace(indicator, "")
+        
+        # Log the cleanup failure
         log_agent_output(
-            agent_name="CompanyVerifier_Error",
+            agent_name="ResponseCleanup_Fallback",
             input_text="",
-            output_text=f"Error: {str(e)}\nReturning unverified response",
+            output_text=f"Error: {str(e)}\nReturning response with manual Q&A cleanup only",
             metadata={"success": False, "error": str(e)}
         )
         
@@ -698,27 +731,17 @@ def run_agent_loop(agent, query, original_query=None, metadata=None, max_retries
         # Enhanced processing for decomposed queries
         info(f"Processing {len(sub_queries)} decomposed sub-queries")
         
-        # Pre-process high-priority sub-queries in order to get core information first
+        # Sub-queries don't depend on each other's answers, so they all run in one batch.
+        # High-priority ones are queued first so they get the first workers.
         high_priority_queries = [sq["sub_query"] for sq in sub_queries if sq.get("priority", 0) >= 8]
-        qa_pairs = []
-        
-        if high_priority_queries:
-            info(f"Processing {len(high_priority_queries)} high-priority queries sequentially")
-            for high_prio_query in high_priority_queries:
-                qa_pair = process_query(agent, high_prio_query)
-                qa_pairs.append(qa_pair)
-        
-        # Process remaining queries in parallel
         remaining_queries = [sq["sub_query"] for sq in sub_queries if sq.get("priority", 0) < 8]
         
-        if remaining_queries:
-            info(f"Processing {len(remaining_queries)} remaining queries in parallel")
-            parallel_results = process_queries_in_parallel(
-                agent, 
-                remaining_queries, 
-                max_workers=min(max_parallel_workers, len(remaining_queries))
-            )
-            qa_pairs.extend(parallel_results)
+        info(f"Processing {len(high_priority_queries)} high-priority and {len(remaining_queries)} remaining queries in parallel")
+        qa_pairs = process_queries_in_parallel(
+            agent,
+            high_priority_queries + remaining_queries,
+            max_workers=min(max_parallel_workers, len(sub_queries))
+        )
         
         # Final check for missing information from all collected responses
         all_responses = "\n\n".join([resp for _, resp in qa_pairs])
@@ -777,12 +800,6 @@ def extract_visualizations(query: str, response: str) -> dict:
     """
     info(f"Starting visualization extraction for response of length {len(response)}")
     
-    # Create a prompt template
-    prompt = ChatPromptTemplate.from_template(TABLE_AND_GRAPH_EXTRACTION_PROMPT)
-    
-    # Create a chain that will extract the visualizations
-    chain = prompt | gpt4_llm | json_parser
-    
     try:
         # Log the visualization extraction attempt
         log_agent_output(
@@ -793,7 +810,7 @@ def extract_visualizations(query: str, response: str) -> dict:
         )
         
         # Invoke the chain to extract visualizations
-        extracted_data = chain.invoke({
+        extracted_data = visualization_chain.invoke({
             "query": query,
             "response": response
         })
@@ -121,20 +121,26 @@ def process_query(user_input, user_id=None, visualization_options=None):
     max_tables = visualization_options.get("max_tables", 5)
     max_graphs = visualization_options.get("max_graphs", 3)
     
-    if (include_tables or include_graphs) and (not result["graphs"] or not result["tables"]):
+    # Only extract the half the agent did not already return
+    need_tables = include_tables and not result["tables"]
+    need_graphs = include_graphs and not result["graphs"]
+    
+    if need_tables or need_graphs:
         try:
             info(f"Extracting visualizations for query: '{user_input[:100]}...'")
             visualizations = extract_visualizations(
                 result["response"], 
                 user_input,
                 max_tables=max_tables,
-                max_graphs=max_graphs
+                max_graphs=max_graphs,
+                include_tables=need_tables,
+                include_graphs=need_graphs
             )
             
-            if include_tables and not result["tables"]:
+            if need_tables:
                 result["tables"] = visualizations.get("tables", [])
                 
-            if include_graphs and not result["graphs"]:
+            if need_graphs:
                 result["graphs"] = visualizations.get("graphs", [])
         except Exception as e:
             error(f"Error extracting visualizations: {e}")
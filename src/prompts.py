@@ -385,6 +385,23 @@ Company XYZ currently trades at a P/E ratio of 15.2, with earnings per share (EP
 **REMEMBER: The final output must contain NO QUESTION-ANSWER PAIRS whatsoever.**
 """
 
+REPORT_CLEANUP_PROMPT = """You are a financial report editor and data verification specialist. Clean up the financial report below in a single pass.
+
+Original query: {original_query}
+
+Report to clean up:
+{text}
+
+Your task:
+1. If the report contains any question-answer format (e.g. "Q:", "Question:", "A:", "Answer:"), convert ALL question-answer pairs into flowing narrative paragraphs or tables and COMPLETELY REMOVE any trace of the Q&A format
+2. If the report contains data about companies NOT mentioned in the original query, remove those sections COMPLETELY
+3. If the report attributes data from one company (e.g., Apple) to another company (e.g., Microsoft), correct those attributions
+4. Preserve ALL financial data and metrics about the queried companies, grouped under appropriate section headings
+5. Make NO OTHER changes to the report content
+
+Cleaned report (with NO question-answer format):
+"""
+
 
 # ------ CHAIN PROMPTS ------
 
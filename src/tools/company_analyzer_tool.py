@@ -1,65 +1,617 @@
+import asyncio
+import httpx
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
 import pandas as pd
+import numpy as np
 import os
 import json
+import orjson
+import gzip
+import zlib
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from langchain.agents import Tool
 from src.prompts import COMPANY_ANALYZER_TOOL_DESCRIPTION
-from src.logger import info, warning, error
+from src.logger import info, warning, error, debug, log_tool_call
 
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
 
-def analyze_company(symbol, api_key=None):
+# (connect, read) timeouts in seconds for Alpha Vantage requests
+REQUEST_TIMEOUT = (5, 30)
+
+_session = None
+
+def _get_session():
+    """
+    Get the shared Alpha Vantage session, creating it on first use.
+    
+    Reusing one session keeps connections to alphavantage.co alive across the
+    many calls an analysis makes, and retries throttled or failed requests.
+    """
+    global _session
+    if _session is None:
+        session = requests.Session()
+        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries))
+        # ACCEPT_ENCODING adds br/zstd when the brotli or zstandard packages are installed
+        session.headers.update({"Accept-Encoding": ACCEPT_ENCODING, "User-Agent": "financial-research-agent"})
+        _session = session
+    return _session
+
+# Requests per minute allowed per API key; the default is the free tier, set ALPHA_VANTAGE_RPM to match your plan
+RATE_LIMIT_RPM = float(os.getenv("ALPHA_VANTAGE_RPM", "5"))
+
+# Alpha Vantage counts calls per minute, so throttling is handled in one-minute windows
+THROTTLE_WINDOW = 60
+
+class _RateLimiter:
+    """
+    Token bucket pacing requests for one API key across threads and event loops.
+    
+    Up to a minute's worth of requests may go out at once; after that they are
+    spaced evenly. Callers reserve a slot under the lock and sleep outside it.
+    A call frequency notice halves the rate once per window; each following
+    window without one doubles it back towards the configured limit.
+    """
+    
+    def __init__(self, rpm):
+        self.max_rate = rpm / 60
+        self.max_capacity = rpm
+        self.rate = self.max_rate
+        self.capacity = self.max_capacity
+        self.tokens = rpm
+        self.updated = time.monotonic()
+        self.throttled_at = None
+        self.recovered_at = None
+        self.lock = threading.Lock()
+    
+    def reserve(self):
+        """Claim the next request slot and return the seconds to wait for it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate) - 1
+            self.updated = now
+            self._recover(now)
+            return max(0.0, -self.tokens / self.rate)
+    
+    def _recover(self, now):
+        """Step the rate back up after a full window without throttling; called with the lock held."""
+        if self.rate >= self.max_rate or now - max(self.throttled_at, self.recovered_at or 0) < THROTTLE_WINDOW:
+            return
+        self.rate = min(self.rate * 2, self.max_rate)
+        self.recovered_at = now
+        if self.rate == self.max_rate:
+            self.capacity = self.max_capacity
+            info(f"Alpha Vantage rate limit recovered to {self.rate * 60:.1f} requests per minute")
+    
+    def acquire(self):
+        time.sleep(self.reserve())
+    
+    async def acquire_async(self):
+        await asyncio.sleep(self.reserve())
+    
+    def slow_down(self):
+        """Halve the rate and drop any burst after Alpha Vantage reports a call frequency limit."""
+        with self.lock:
+            now = time.monotonic()
+            # Other responses from the same burst report the same limit; count it once per window
+            if self.throttled_at is not None and now - self.throttled_at < THROTTLE_WINDOW:
+                return
+            self.throttled_at = now
+            self.rate = max(self.rate / 2, 1 / 60)
+            self.capacity = 1
+            self.tokens = min(self.tokens, 0)
+            warning(f"Alpha Vantage rate limit hit, slowing to {self.rate * 60:.1f} requests per minute")
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def _get_rate_limiter(api_key):
+    """Get the shared rate limiter for an API key."""
+    with _rate_limiters_lock:
+        if api_key not in _rate_limiters:
+            _rate_limiters[api_key] = _RateLimiter(RATE_LIMIT_RPM)
+        return _rate_limiters[api_key]
+
+def _is_throttled(data):
+    """Check whether a response is Alpha Vantage's call frequency notice instead of data."""
+    notice = data.get("Note") or data.get("Information") or ""
+    return "call frequency" in notice
+
+
+# All data points fetched for an analysis, in the order they are reported
+DATA_POINTS = [
+    {"function": "OVERVIEW", "title": "COMPANY OVERVIEW"},
+    {"function": "GLOBAL_QUOTE", "title": "CURRENT STOCK PRICE"},
+    {"function": "TIME_SERIES_DAILY", "title": "DAILY STOCK PRICES (Last 100 Days)"},
+    {"function": "SMA", "params": {"interval": "daily", "time_period": "50", "series_type": "close"}, 
+     "title": "SIMPLE MOVING AVERAGE (50-Day)"},
+    {"function": "EMA", "params": {"interval": "daily", "time_period": "20", "series_type": "close"}, 
+     "title": "EXPONENTIAL MOVING AVERAGE (20-Day)"},
+    {"function": "INCOME_STATEMENT", "title": "INCOME STATEMENT"},
+    {"function": "BALANCE_SHEET", "title": "BALANCE SHEET"},
+    {"function": "CASH_FLOW", "title": "CASH FLOW"},
+    {"function": "EARNINGS", "title": "EARNINGS"},
+]
+
+# Requests in flight at once for one analysis; stays within the session's pool
+FETCH_WORKERS = 8
+
+# Connections the async client keeps open across all symbols in a batch
+ASYNC_MAX_CONNECTIONS = 32
+
+# Responses are cached on disk; quotes move during the day, everything else at most daily
+CACHE_DIR = os.getenv("ALPHA_VANTAGE_CACHE_DIR", os.path.join(os.getenv("DATA_DIR", "./data"), "alphavantage"))
+CACHE_TTL = {"GLOBAL_QUOTE": 300}
+DEFAULT_CACHE_TTL = 86400
+
+def _cache_path(params):
+    """Get the cache file for a request, keyed on its parameters without the API key."""
+    key = json.dumps({k: v for k, v in params.items() if k != "apikey"}, sort_keys=True)
+    return os.path.join(CACHE_DIR, hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + ".json.gz")
+
+# Recent responses are also kept in memory, so repeated analyses in one process skip the disk
+MEMORY_CACHE_SIZE = 256
+_memory_cache = OrderedDict()
+_memory_cache_lock = threading.Lock()
+
+def _remember(path, stored_at, content):
+    """Keep response bytes in the in-process LRU, evicting the oldest entry when full."""
+    with _memory_cache_lock:
+        _memory_cache[path] = (stored_at, content)
+        _memory_cache.move_to_end(path)
+        if len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+def _read_cache(path, ttl):
+    """Return cached response bytes if the entry exists and is younger than ttl seconds."""
+    with _memory_cache_lock:
+        entry = _memory_cache.get(path)
+        if entry is not None:
+            _memory_cache.move_to_end(path)
+    if entry is not None and time.time() - entry[0] <= ttl:
+        return entry[1]
+    
+    try:
+        stored_at = os.path.getmtime(path)
+        if time.time() - stored_at > ttl:
+            return None
+        with open(path, "rb") as f:
+            content = gzip.decompress(f.read())
+    except (OSError, EOFError, zlib.error):
+        return None
+    _remember(path, stored_at, content)
+    return content
+
+def _write_cache(path, content):
+    """Store response bytes in memory and on disk, replacing any previous entry atomically."""
+    _remember(path, time.time(), content)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(gzip.compress(content, compresslevel=5))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        warning(f"Could not cache Alpha Vantage response: {e}")
+
+def _resolve_api_key(api_key):
+    """Use the given API key, falling back to ALPHA_VANTAGE_API_KEY and then the demo key."""
+    return api_key or os.environ.get("ALPHA_VANTAGE_API_KEY") or "FZ1EGW6DY7BS7CA1"
+
+def _request_params(symbol, data_point, api_key):
+    """Build the query parameters for one data point."""
+    params = {
+        "function": data_point["function"],
+        "symbol": symbol,
+        "apikey": api_key
+    }
+    
+    # Add any additional parameters
+    if "params" in data_point:
+        params.update(data_point["params"])
+    return params
+
+def _cached_data(symbol, data_point, cache_path):
+    """Return the cached data point if it is still fresh, otherwise None."""
+    content = _read_cache(cache_path, CACHE_TTL.get(data_point["function"], DEFAULT_CACHE_TTL))
+    if content is None:
+        return None
+    info(f"Using cached {data_point['function']} data for {symbol}")
+    return orjson.loads(content)
+
+def _decode_response(symbol, data_point, api_key, cache_path, ok, content, headers):
+    """Decode an API response body, caching it if it holds real data."""
+    debug(f"{data_point['function']} response for {symbol}: {len(content)} bytes, "
+          f"Content-Encoding {headers.get('Content-Encoding', 'identity')}")
+    data = orjson.loads(content)
+    if _is_throttled(data):
+        _get_rate_limiter(api_key).slow_down()
+    
+    # Only cache real data, not errors or rate limit notices
+    if ok and not {"Error Message", "Information", "Note"} & data.keys():
+        _write_cache(cache_path, content)
+    return data
+
+def fetch_data_point(symbol, data_point, api_key, refresh=False):
+    """
+    Fetch one Alpha Vantage data point for a symbol and return the decoded JSON.
+    
+    Successful responses are served from the disk cache while fresh; pass
+    refresh=True to always hit the API.
+    """
+    params = _request_params(symbol, data_point, api_key)
+    cache_path = _cache_path(params)
+    if not refresh:
+        data = _cached_data(symbol, data_point, cache_path)
+        if data is not None:
+            return data
+        
+    # Make API request
+    _get_rate_limiter(api_key).acquire()
+    info(f"Making request for {data_point['function']} data for {symbol}")
+    response = _get_session().get(ALPHA_VANTAGE_URL, params=params, timeout=REQUEST_TIMEOUT)
+    return _decode_response(symbol, data_point, api_key, cache_path, response.ok, response.content, response.headers)
+
+async def fetch_data_point_async(client, symbol, data_point, api_key, refresh=False):
+    """
+    Async counterpart of fetch_data_point using a shared httpx.AsyncClient.
+    
+    Cache access and decoding run in a worker thread so the event loop is not
+    blocked by file I/O or parsing.
+    """
+    params = _request_params(symbol, data_point, api_key)
+    cache_path = _cache_path(params)
+    if not refresh:
+        data = await asyncio.to_thread(_cached_data, symbol, data_point, cache_path)
+        if data is not None:
+            return data
+    
+    await _get_rate_limiter(api_key).acquire_async()
+    info(f"Making request for {data_point['function']} data for {symbol}")
+    response = await client.get(ALPHA_VANTAGE_URL, params=params)
+    return await asyncio.to_thread(
+        _decode_response, symbol, data_point, api_key, cache_path, response.is_success, response.content, response.headers
+    )
+
+# Alpha Vantage time series keys and the column names series_frame gives them
+SERIES_COLUMNS = {
+    "1. open": "open",
+    "2. high": "high",
+    "3. low": "low",
+    "4. close": "close",
+    "5. volume": "volume",
+    "5. adjusted close": "adjusted_close",
+    "6. volume": "volume",
+    "7. dividend amount": "dividend_amount",
+    "8. split coefficient": "split_coefficient",
+}
+
+# Response key holding each time series; indicators use "Technical Analysis: <function>"
+SERIES_KEYS = {
+    "TIME_SERIES_DAILY": "Time Series (Daily)",
+    "TIME_SERIES_DAILY_ADJUSTED": "Time Series (Daily)",
+    "TIME_SERIES_WEEKLY": "Weekly Time Series",
+    "TIME_SERIES_WEEKLY_ADJUSTED": "Weekly Adjusted Time Series",
+    "TIME_SERIES_MONTHLY": "Monthly Time Series",
+    "TIME_SERIES_MONTHLY_ADJUSTED": "Monthly Adjusted Time Series",
+}
+
+# Every key a time series response may hold its values under
+SERIES_RESPONSE_KEYS = frozenset([
+    *SERIES_KEYS.values(),
+    *(f"Time Series ({interval})" for interval in ("1min", "5min", "15min", "30min", "60min")),
+])
+
+# Raised by Alpha Vantage fields that are missing, empty or "None" when converted or indexed
+FIELD_ERRORS = (ValueError, TypeError, KeyError, IndexError)
+
+def series_key(function, data):
+    """Find the key holding the time series or indicator values in an Alpha Vantage response."""
+    key = SERIES_KEYS.get(function, f"Technical Analysis: {function}")
+    if key in data:
+        return key
+    
+    # Intraday responses name the key after their interval
+    return next(iter(SERIES_RESPONSE_KEYS & data.keys()), None)
+
+def series_frame(series):
+    """
+    Build a numeric DataFrame, most recent first, from an Alpha Vantage series.
+    
+    Each column is parsed straight from the response into a numeric array,
+    skipping the all-string frame from_dict would build first. Price keys
+    are renamed via SERIES_COLUMNS; values that are not numbers become NaN.
+    """
+    rows = list(series.values())
+    keys = list(rows[0]) if rows else []
+    df = pd.DataFrame(
+        {
+            SERIES_COLUMNS.get(key, key): pd.to_numeric(np.array([row.get(key) for row in rows], dtype=object), errors="coerce")
+            for key in keys
+        },
+        # Dates are always ISO 8601 (with a time for intraday), so skip format inference
+        index=pd.to_datetime(list(series), format="ISO8601")
+    )
+    return df.sort_index(ascending=False)
+
+def format_overview(data, function):
+    """Format the key fields of a company overview."""
+    text = ""
+    important_fields = [
+        "Symbol", "Name", "Description", "Exchange", "Industry", "Sector",
+        "MarketCapitalization", "PERatio", "PEGRatio", "BookValue", "DividendPerShare",
+        "DividendYield", "EPS", "RevenuePerShareTTM", "ProfitMargin", "QuarterlyEarningsGrowthYOY",
+        "QuarterlyRevenueGrowthYOY", "AnalystTargetPrice", "52WeekHigh", "52WeekLow"
+    ]
+
+    for field in important_fields:
+        if field in data:
+            # Format monetary values
+            if field in ["MarketCapitalization"]:
+                try:
+                    value = float(data[field])
+                    if value >= 1e9:
+                        formatted_value = f"${value/1e9:.2f} billion"
+                    elif value >= 1e6:
+                        formatted_value = f"${value/1e6:.2f} million"
+                    else:
+                        formatted_value = f"${value:,.2f}"
+                    text += f"{field}: {formatted_value}\n"
+                except FIELD_ERRORS:
+                    text += f"{field}: {data[field]}\n"
+            # Format percentages
+            elif field in ["DividendYield", "ProfitMargin", "QuarterlyEarningsGrowthYOY", "QuarterlyRevenueGrowthYOY"]:
+                try:
+                    value = float(data[field])
+                    text += f"{field}: {value*100:.2f}%\n"
+                except FIELD_ERRORS:
+                    text += f"{field}: {data[field]}\n"
+            # Other values
+            else:
+                text += f"{field}: {data[field]}\n"
+    return text
+
+def format_global_quote(data, function):
+    """Format the latest quote for the symbol."""
+    text = ""
+    if "Global Quote" in data:
+        quote = data["Global Quote"]
+        text += f"Symbol: {quote.get('01. symbol', 'N/A')}\n"
+        text += f"Price: ${quote.get('05. price', 'N/A')}\n"
+        text += f"Change: {quote.get('09. change', 'N/A')} ({quote.get('10. change percent', 'N/A')})\n"
+        text += f"Volume: {quote.get('06. volume', 'N/A')}\n"
+        text += f"Latest Trading Day: {quote.get('07. latest trading day', 'N/A')}\n"
+    return text
+
+def format_time_series(data, function):
+    """Format the last 10 days of a price series with summary statistics."""
+    text = ""
+    # Find the time series key
+    ts_key = series_key(function, data)
+
+    if ts_key:
+        # Convert to DataFrame for easier handling
+        df = series_frame(data[ts_key]) # Most recent first
+
+        # Display only the last 10 days
+        text += "Recent price data (last 10 days):\n"
+        for date, row in df.head(10).iterrows():
+            date_str = date.strftime("%Y-%m-%d")
+            try:
+                open_price = float(row.get('open', 0))
+                high_price = float(row.get('high', 0))
+                low_price = float(row.get('low', 0))
+                close_price = float(row.get('close', 0))
+                volume = int(row.get('volume', 0))
+
+                text += f"{date_str}: Open ${open_price:.2f}, Close ${close_price:.2f}, "
+                text += f"High ${high_price:.2f}, Low ${low_price:.2f}, Volume {volume:,}\n"
+            except FIELD_ERRORS:
+                # Missing values are NaN in the numeric frame
+                values = ", ".join(f"{col} {'N/A' if pd.isna(val) else val}" for col, val in row.items())
+                text += f"{date_str}: {values}\n"
+
+        # Add summary statistics
+        if len(df) > 0:
+            text += "\nSummary Statistics:\n"
+            try:
+                latest_close = float(df['close'].iloc[0])
+                highest_price = df['high'].max()
+                lowest_price = df['low'].min()
+                avg_volume = df['volume'].mean()
+
+                text += f"Latest Close: ${latest_close:.2f}\n"
+                text += f"Highest Price (100 days): ${highest_price:.2f}\n"
+                text += f"Lowest Price (100 days): ${lowest_price:.2f}\n"
+                text += f"Average Volume: {avg_volume:,.0f}\n"
+            except FIELD_ERRORS:
+                text += "Could not calculate summary statistics\n"
+    return text
+
+def format_indicator(data, function):
+    """Format the last 10 values of a technical indicator."""
+    text = ""
+    # Find the technical indicator key
+    indicator_key = series_key(function, data)
+
+    if indicator_key:
+        # Convert to DataFrame for easier handling
+        df = series_frame(data[indicator_key]) # Most recent first
+
+        # Display the last 10 values
+        text += f"Recent {function} values (last 10 days):\n"
+        for date, row in df.head(10).iterrows():
+            date_str = date.strftime("%Y-%m-%d")
+            for col, val in row.items():
+                if pd.isna(val):
+                    text += f"{date_str}: {col}: N/A\n"
+                    continue
+                try:
+                    val_float = float(val)
+                    text += f"{date_str}: {col}: ${val_float:.2f}\n"
+                except FIELD_ERRORS:
+                    text += f"{date_str}: {col}: {val}\n"
+    return text
+
+# Fields reported from each financial statement
+STATEMENT_FIELDS = {
+    "INCOME_STATEMENT": [
+        "totalRevenue", "grossProfit", "operatingIncome", "netIncome", 
+        "ebitda", "eps"
+    ],
+    "BALANCE_SHEET": [
+        "totalAssets", "totalCurrentAssets", "cashAndCashEquivalentsAtCarryingValue",
+        "totalLiabilities", "totalCurrentLiabilities", "totalShareholderEquity", 
+        "treasuryStock"
+    ],
+    "CASH_FLOW": [
+        "operatingCashflow", "cashflowFromInvestment", "cashflowFromFinancing",
+        "dividendPayout", "netIncome"
+    ],
+}
+
+def format_statement(data, function):
+    """Format the most recent annual and quarterly financial statement."""
+    text = ""
+    important_fields = STATEMENT_FIELDS[function]
+    if "annualReports" in data and "quarterlyReports" in data:
+        # First show the most recent annual report
+        if data["annualReports"]:
+            annual = data["annualReports"][0] # Most recent annual report
+            text += f"Most Recent Annual Report (Fiscal Year: {annual.get('fiscalDateEnding', 'N/A')}):\n"
+
+            for field in important_fields:
+                if field in annual:
+                    try:
+                        value = float(annual[field])
+                        if abs(value) >= 1e9:
+                            formatted_value = f"${value/1e9:.2f} billion"
+                        elif abs(value) >= 1e6:
+                            formatted_value = f"${value/1e6:.2f} million"
+                        else:
+                            formatted_value = f"${value:,.2f}"
+                        text += f"{field}: {formatted_value}\n"
+                    except FIELD_ERRORS:
+                        text += f"{field}: {annual[field]}\n"
+
+        # Then show the most recent quarterly report
+        if data["quarterlyReports"]:
+            quarterly = data["quarterlyReports"][0] # Most recent quarterly report
+            text += f"\nMost Recent Quarterly Report (Quarter Ending: {quarterly.get('fiscalDateEnding', 'N/A')}):\n"
+
+            for field in important_fields:
+                if field in quarterly:
+                    try:
+                        value = float(quarterly[field])
+                        if abs(value) >= 1e9:
+                            formatted_value = f"${value/1e9:.2f} billion"
+                        elif abs(value) >= 1e6:
+                            formatted_value = f"${value/1e6:.2f} million"
+                        else:
+                            formatted_value = f"${value:,.2f}"
+                        text += f"{field}: {formatted_value}\n"
+                    except FIELD_ERRORS:
+                        text += f"{field}: {quarterly[field]}\n"
+    return text
+
+def format_earnings(data, function):
+    """Format recent annual and quarterly earnings."""
+    text = ""
+    if "annualEarnings" in data and len(data["annualEarnings"]) > 0:
+        text += "Annual Earnings (Last 5 Years):\n"
+        for i, earning in enumerate(data["annualEarnings"][:5]):
+            text += f"Fiscal Year Ending {earning.get('fiscalDateEnding', 'N/A')}: "
+            try:
+                eps = float(earning.get('reportedEPS', 0))
+                text += f"EPS ${eps:.2f}\n"
+            except FIELD_ERRORS:
+                text += f"EPS {earning.get('reportedEPS', 'N/A')}\n"
+
+    if "quarterlyEarnings" in data and len(data["quarterlyEarnings"]) > 0:
+        text += "\nQuarterly Earnings (Last 4 Quarters):\n"
+        for i, earning in enumerate(data["quarterlyEarnings"][:4]):
+            text += f"Quarter Ending {earning.get('fiscalDateEnding', 'N/A')}: "
+            try:
+                reported_eps = float(earning.get('reportedEPS', 0))
+                estimated_eps = float(earning.get('estimatedEPS', 0))
+                surprise_pct = float(earning.get('surprisePercentage', 0))
+
+                text += f"Reported EPS ${reported_eps:.2f}, "
+                text += f"Estimated EPS ${estimated_eps:.2f}, "
+                text += f"Surprise {surprise_pct:+.2f}%\n"
+            except FIELD_ERRORS:
+                text += f"Reported {earning.get('reportedEPS', 'N/A')}, "
+                text += f"Estimated {earning.get('estimatedEPS', 'N/A')}\n"
+    return text
+
+def format_raw(data, function):
+    """Format a response no dedicated formatter knows, as indented JSON."""
+    return json.dumps(data, indent=2) + "\n"
+
+# Formatter for each Alpha Vantage function; anything else is dumped as JSON
+INDICATOR_FUNCTIONS = frozenset(["SMA", "EMA", "MACD", "RSI", "BBANDS"])
+FORMATTERS = {
+    "OVERVIEW": format_overview,
+    "GLOBAL_QUOTE": format_global_quote,
+    "TIME_SERIES_INTRADAY": format_time_series,
+    **dict.fromkeys(SERIES_KEYS, format_time_series),
+    **dict.fromkeys(INDICATOR_FUNCTIONS, format_indicator),
+    **dict.fromkeys(["INCOME_STATEMENT", "BALANCE_SHEET", "CASH_FLOW"], format_statement),
+    "EARNINGS": format_earnings,
+}
+
+def analyze_company(symbol, api_key=None, refresh=False):
     """
     Fetches and returns comprehensive data about a company from Alpha Vantage API.
     
     Args:
         symbol: Company stock ticker symbol (e.g., 'AAPL', 'MSFT', 'GOOGL')
         api_key: Alpha Vantage API key (if None, will use environment variable)
+        refresh: Skip the response cache and fetch everything from the API
         
     Returns:
         Comprehensive company data as formatted text
     """
     info(f"Analyzing company data for: {symbol}")
     
-    api_key = api_key or os.environ.get("ALPHA_VANTAGE_API_KEY") or "FZ1EGW6DY7BS7CA1"
-    base_url = "https://www.alphavantage.co/query"
+    api_key = _resolve_api_key(api_key)
+    
+    # Fetch every data point concurrently; results are formatted in DATA_POINTS order
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        futures = [pool.submit(fetch_data_point, symbol, data_point, api_key, refresh) for data_point in DATA_POINTS]
+    
+    return format_analysis(symbol, [future.exception() or future.result() for future in futures])
+
+def format_analysis(symbol, results):
+    """
+    Build the analysis text from fetched data points.
+    
+    Args:
+        symbol: Company stock ticker symbol
+        results: One entry per DATA_POINTS item, either the decoded response
+            or the exception raised while fetching it
+        
+    Returns:
+        Comprehensive company data as formatted text
+    """
     result_text = f"COMPREHENSIVE ANALYSIS FOR: {symbol}\n{'=' * 50}\n\n"
     
     # Store data for calculating ratios later
     all_data = {}
     
-    # Define all data points we want to fetch
-    data_points = [
-        {"function": "OVERVIEW", "title": "COMPANY OVERVIEW"},
-        {"function": "GLOBAL_QUOTE", "title": "CURRENT STOCK PRICE"},
-        {"function": "TIME_SERIES_DAILY", "title": "DAILY STOCK PRICES (Last 100 Days)"},
-        {"function": "SMA", "params": {"interval": "daily", "time_period": "50", "series_type": "close"}, 
-         "title": "SIMPLE MOVING AVERAGE (50-Day)"},
-        {"function": "EMA", "params": {"interval": "daily", "time_period": "20", "series_type": "close"}, 
-         "title": "EXPONENTIAL MOVING AVERAGE (20-Day)"},
-        {"function": "INCOME_STATEMENT", "title": "INCOME STATEMENT"},
-        {"function": "BALANCE_SHEET", "title": "BALANCE SHEET"},
-        {"function": "CASH_FLOW", "title": "CASH FLOW"},
-        {"function": "EARNINGS", "title": "EARNINGS"},
-    ]
-    
-    for data_point in data_points:
+    for data_point, data in zip(DATA_POINTS, results):
         try:
-            # Prepare request parameters
-            params = {
-                "function": data_point["function"],
-                "symbol": symbol,
-                "apikey": api_key
-            }
-            
-            # Add any additional parameters
-            if "params" in data_point:
-                params.update(data_point["params"])
-                
-            # Make API request
-            info(f"Making request for {data_point['function']} data for {symbol}")
-            response = requests.get(base_url, params=params)
-            data = response.json()
+            # A failed fetch is reported in its own section like any other error
+            if isinstance(data, BaseException):
+                raise data
             
             # Store the data for ratio calculations
             all_data[data_point["function"]] = data
@@ -80,410 +632,203 @@ def analyze_company(symbol, api_key=None):
             
             # Format data based on the function
             result_text += f"\n{data_point['title']}\n{'-' * 30}\n"
-            
-            # Company Overview
-            if data_point["function"] == "OVERVIEW":
-                important_fields = [
-                    "Symbol", "Name", "Description", "Exchange", "Industry", "Sector",
-                    "MarketCapitalization", "PERatio", "PEGRatio", "BookValue", "DividendPerShare",
-                    "DividendYield", "EPS", "RevenuePerShareTTM", "ProfitMargin", "QuarterlyEarningsGrowthYOY",
-                    "QuarterlyRevenueGrowthYOY", "AnalystTargetPrice", "52WeekHigh", "52WeekLow"
-                ]
-                
-                for field in important_fields:
-                    if field in data:
-                        # Format monetary values
-                        if field in ["MarketCapitalization"]:
-                            try:
-                                value = float(data[field])
-                                if value >= 1e9:
-                                    formatted_value = f"${value/1e9:.2f} billion"
-                                elif value >= 1e6:
-                                    formatted_value = f"${value/1e6:.2f} million"
-                                else:
-                                    formatted_value = f"${value:,.2f}"
-                                result_text += f"{field}: {formatted_value}\n"
-                            except:
-                                result_text += f"{field}: {data[field]}\n"
-                        # Format percentages
-                        elif field in ["DividendYield", "ProfitMargin", "QuarterlyEarningsGrowthYOY", "QuarterlyRevenueGrowthYOY"]:
-                            try:
-                                value = float(data[field])
-                                result_text += f"{field}: {value*100:.2f}%\n"
-                            except:
-                                result_text += f"{field}: {data[field]}\n"
-                        # Other values
-                        else:
-                            result_text += f"{field}: {data[field]}\n"
-                            
-            # Global Quote
-            elif data_point["function"] == "GLOBAL_QUOTE":
-                if "Global Quote" in data:
-                    quote = data["Global Quote"]
-                    result_text += f"Symbol: {quote.get('01. symbol', 'N/A')}\n"
-                    result_text += f"Price: ${quote.get('05. price', 'N/A')}\n"
-                    result_text += f"Change: {quote.get('09. change', 'N/A')} ({quote.get('10. change percent', 'N/A')})\n"
-                    result_text += f"Volume: {quote.get('06. volume', 'N/A')}\n"
-                    result_text += f"Latest Trading Day: {quote.get('07. latest trading day', 'N/A')}\n"
-                    
-            # Time Series Data
-            elif data_point["function"].startswith("TIME_SERIES"):
-                # Find the time series key
-                ts_key = next((k for k in data.keys() if k.startswith("Time Series") or k.endswith("Time Series")), None)
-                
-                if ts_key:
-                    # Convert to DataFrame for easier handling
-                    df = pd.DataFrame.from_dict(data[ts_key], orient="index")
-                    df.index = pd.to_datetime(df.index)
-                    df = df.sort_index(ascending=False) # Most recent first
-                    
-                    # Display only the last 10 days
-                    result_text += "Recent price data (last 10 days):\n"
-                    for date, row in df.head(10).iterrows():
-                        date_str = date.strftime("%Y-%m-%d")
-                        try:
-                            open_price = float(row.get('1. open', row.get('open', 0)))
-                            high_price = float(row.get('2. high', row.get('high', 0)))
-                            low_price = float(row.get('3. low', row.get('low', 0)))
-                            close_price = float(row.get('4. close', row.get('close', 0)))
-                            volume = int(float(row.get('5. volume', row.get('volume', 0))))
-                            
-                            result_text += f"{date_str}: Open ${open_price:.2f}, Close ${close_price:.2f}, "
-                            result_text += f"High ${high_price:.2f}, Low ${low_price:.2f}, Volume {volume:,}\n"
-                        except:
-                            result_text += f"{date_str}: {dict(row)}\n"
-                    
-                    # Add summary statistics
-                    if len(df) > 0:
-                        result_text += "\nSummary Statistics:\n"
-                        try:
-                            latest_close = float(df.iloc[0].get('4. close', df.iloc[0].get('close', 0)))
-                            highest_price = df['2. high' if '2. high' in df.columns else 'high'].astype(float).max()
-                            lowest_price = df['3. low' if '3. low' in df.columns else 'low'].astype(float).min()
-                            avg_volume = df['5. volume' if '5. volume' in df.columns else 'volume'].astype(float).mean()
-                            
-                            result_text += f"Latest Close: ${latest_close:.2f}\n"
-                            result_text += f"Highest Price (100 days): ${highest_price:.2f}\n"
-                            result_text += f"Lowest Price (100 days): ${lowest_price:.2f}\n"
-                            result_text += f"Average Volume: {avg_volume:,.0f}\n"
-                        except:
-                            result_text += "Could not calculate summary statistics\n"
-                
-            # Technical Indicators (SMA, EMA, etc.)
-            elif data_point["function"] in ["SMA", "EMA", "MACD", "RSI", "BBANDS"]:
-                # Find the technical indicator key
-                indicator_key = next((k for k in data.keys() if k.startswith("Technical Analysis")), None)
-                
-                if indicator_key:
-                    # Convert to DataFrame for easier handling
-                    df = pd.DataFrame.from_dict(data[indicator_key], orient="index")
-                    df.index = pd.to_datetime(df.index)
-                    df = df.sort_index(ascending=False) # Most recent first
-                    
-                    # Display the last 10 values
-                    result_text += f"Recent {data_point['function']} values (last 10 days):\n"
-                    for date, row in df.head(10).iterrows():
-                        date_str = date.strftime("%Y-%m-%d")
-                        for col, val in row.items():
-                            try:
-                                val_float = float(val)
-                                result_text += f"{date_str}: {col}: ${val_float:.2f}\n"
-                            except:
-                                result_text += f"{date_str}: {col}: {val}\n"
-                
-            # Financial Statements
-            elif data_point["function"] in ["INCOME_STATEMENT", "BALANCE_SHEET", "CASH_FLOW"]:
-                if "annualReports" in data and "quarterlyReports" in data:
-                    # First show the most recent annual report
-                    if data["annualReports"]:
-                        annual = data["annualReports"][0] # Most recent annual report
-                        result_text += f"Most Recent Annual Report (Fiscal Year: {annual.get('fiscalDateEnding', 'N/A')}):\n"
-                        
-                        # Select important fields based on the statement type
-                        if data_point["function"] == "INCOME_STATEMENT":
-                            important_fields = [
-                                "totalRevenue", "grossProfit", "operatingIncome", "netIncome", 
-                                "ebitda", "eps"
-                            ]
-                        elif data_point["function"] == "BALANCE_SHEET":
-                            important_fields = [
-                                "totalAssets", "totalCurrentAssets", "cashAndCashEquivalentsAtCarryingValue",
-                                "totalLiabilities", "totalCurrentLiabilities", "totalShareholderEquity", 
-                                "treasuryStock"
-                            ]
-                        elif data_point["function"] == "CASH_FLOW":
-                            important_fields = [
-                                "operatingCashflow", "cashflowFromInvestment", "cashflowFromFinancing",
-                                "dividendPayout", "netIncome"
-                            ]
-                        
-                        for field in important_fields:
-                            if field in annual:
-                                try:
-                                    value = float(annual[field])
-                                    if abs(value) >= 1e9:
-                                        formatted_value = f"${value/1e9:.2f} billion"
-                                    elif abs(value) >= 1e6:
-                                        formatted_value = f"${value/1e6:.2f} million"
-                                    else:
-                                        formatted_value = f"${value:,.2f}"
-                                    result_text += f"{field}: {formatted_value}\n"
-                                except:
-                                    result_text += f"{field}: {annual[field]}\n"
-                        
-                    # Then show the most recent quarterly report
-                    if data["quarterlyReports"]:
-                        quarterly = data["quarterlyReports"][0] # Most recent quarterly report
-                        result_text += f"\nMost Recent Quarterly Report (Quarter Ending: {quarterly.get('fiscalDateEnding', 'N/A')}):\n"
-                        
-                        for field in important_fields:
-                            if field in quarterly:
-                                try:
-                                    value = float(quarterly[field])
-                                    if abs(value) >= 1e9:
-                                        formatted_value = f"${value/1e9:.2f} billion"
-                                    elif abs(value) >= 1e6:
-                                        formatted_value = f"${value/1e6:.2f} million"
-                                    else:
-                                        formatted_value = f"${value:,.2f}"
-                                    result_text += f"{field}: {formatted_value}\n"
-                                except:
-                                    result_text += f"{field}: {quarterly[field]}\n"
-            
-            # Earnings
-            elif data_point["function"] == "EARNINGS":
-                if "annualEarnings" in data and len(data["annualEarnings"]) > 0:
-                    result_text += "Annual Earnings (Last 5 Years):\n"
-                    for i, earning in enumerate(data["annualEarnings"][:5]):
-                        result_text += f"Fiscal Year Ending {earning.get('fiscalDateEnding', 'N/A')}: "
-                        try:
-                            eps = float(earning.get('reportedEPS', 0))
-                            result_text += f"EPS ${eps:.2f}\n"
-                        except:
-                            result_text += f"EPS {earning.get('reportedEPS', 'N/A')}\n"
+            result_text += FORMATTERS.get(data_point["function"], format_raw)(data, data_point["function"])
                 
-                if "quarterlyEarnings" in data and len(data["quarterlyEarnings"]) > 0:
-                    result_text += "\nQuarterly Earnings (Last 4 Quarters):\n"
-                    for i, earning in enumerate(data["quarterlyEarnings"][:4]):
-                        result_text += f"Quarter Ending {earning.get('fiscalDateEnding', 'N/A')}: "
-                        try:
-                            reported_eps = float(earning.get('reportedEPS', 0))
-                            estimated_eps = float(earning.get('estimatedEPS', 0))
-                            surprise_pct = float(earning.get('surprisePercentage', 0))
-                            
-                            result_text += f"Reported EPS ${reported_eps:.2f}, "
-                            result_text += f"Estimated EPS ${estimated_eps:.2f}, "
-                            result_text += f"Surprise {surprise_pct:+.2f}%\n"
-                        except:
-                            result_text += f"Reported {earning.get('reportedEPS', 'N/A')}, "
-                            result_text += f"Estimated {earning.get('estimatedEPS', 'N/A')}\n"
-            
-            # Default handling for other function types
-            else:
-                result_text += json.dumps(data, indent=2) + "\n"
-                
-        except Exception as e:
+        except (requests.RequestException, httpx.HTTPError, ValueError) as e:
             error(f"Error retrieving {data_point['function']} for {symbol}: {str(e)}")
             result_text += f"Error retrieving {data_point['function']}: {str(e)}\n"
     
     # Calculate and add financial ratios section
     result_text += f"\nFINANCIAL RATIOS\n{'-' * 30}\n"
     
-    try:
-        # Get necessary data for calculations
-        overview = all_data.get("OVERVIEW", {})
-        income_statement = all_data.get("INCOME_STATEMENT", {})
-        balance_sheet = all_data.get("BALANCE_SHEET", {})
-        cash_flow = all_data.get("CASH_FLOW", {})
-        quote = all_data.get("GLOBAL_QUOTE", {}).get("Global Quote", {})
-        
-        # Valuation Ratios
-        result_text += "Valuation Ratios:\n"
-        
-        # P/E Ratio (Price to Earnings)
-        if "PERatio" in overview:
-            try:
-                pe_ratio = float(overview["PERatio"])
-                result_text += f"P/E Ratio: {pe_ratio:.2f}\n"
-            except:
-                result_text += f"P/E Ratio: {overview.get('PERatio', 'N/A')}\n"
-        
-        # PEG Ratio (Price/Earnings to Growth)
-        if "PEGRatio" in overview:
-            try:
-                peg_ratio = float(overview["PEGRatio"])
-                result_text += f"PEG Ratio: {peg_ratio:.2f}\n"
-            except:
-                result_text += f"PEG Ratio: {overview.get('PEGRatio', 'N/A')}\n"
-        
-        # P/B Ratio (Price to Book)
+    # Get necessary data for calculations
+    overview = all_data.get("OVERVIEW", {})
+    income_statement = all_data.get("INCOME_STATEMENT", {})
+    balance_sheet = all_data.get("BALANCE_SHEET", {})
+    
+    # Valuation Ratios
+    result_text += "Valuation Ratios:\n"
+    
+    # P/E Ratio (Price to Earnings)
+    if "PERatio" in overview:
         try:
-            market_cap = float(overview.get("MarketCapitalization", 0))
-            book_value = float(overview.get("BookValue", 0)) * float(overview.get("SharesOutstanding", 0))
-            if market_cap > 0 and book_value > 0:
-                pb_ratio = market_cap / book_value
-                result_text += f"P/B Ratio: {pb_ratio:.2f}\n"
-        except:
-            # If we can't calculate it, use the overview data if available
-            if "PriceToBookRatio" in overview:
-                result_text += f"P/B Ratio: {overview['PriceToBookRatio']}\n"
-        
-        # Calculate P/S (Price to Sales) Ratio
+            pe_ratio = float(overview["PERatio"])
+            result_text += f"P/E Ratio: {pe_ratio:.2f}\n"
+        except FIELD_ERRORS:
+            result_text += f"P/E Ratio: {overview.get('PERatio', 'N/A')}\n"
+    
+    # PEG Ratio (Price/Earnings to Growth)
+    if "PEGRatio" in overview:
         try:
-            market_cap = float(overview.get("MarketCapitalization", 0))
-            revenue = 0
-            if income_statement and "annualReports" in income_statement and income_statement["annualReports"]:
-                revenue = float(income_statement["annualReports"][0].get("totalRevenue", 0))
-            
-            if market_cap > 0 and revenue > 0:
-                ps_ratio = market_cap / revenue
-                result_text += f"P/S Ratio: {ps_ratio:.2f}\n"
-        except:
-            # If we can't calculate it, use the overview data if available
-            if "PriceToSalesRatioTTM" in overview:
-                result_text += f"P/S Ratio: {overview['PriceToSalesRatioTTM']}\n"
-        
-        # Dividend Yield
-        if "DividendYield" in overview:
-            try:
-                dividend_yield = float(overview["DividendYield"]) * 100
-                result_text += f"Dividend Yield: {dividend_yield:.2f}%\n"
-            except:
-                result_text += f"Dividend Yield: {overview.get('DividendYield', 'N/A')}\n"
-        
-        # Profitability Ratios
-        result_text += "\nProfitability Ratios:\n"
-        
-        # ROE (Return on Equity)
-        if "ReturnOnEquityTTM" in overview:
-            try:
-                roe = float(overview["ReturnOnEquityTTM"]) * 100
-                result_text += f"Return on Equity (ROE): {roe:.2f}%\n"
-            except:
-                result_text += f"Return on Equity (ROE): {overview.get('ReturnOnEquityTTM', 'N/A')}\n"
-        else:
-            # Calculate ROE manually
-            try:
-                if income_statement and balance_sheet and "annualReports" in income_statement and "annualReports" in balance_sheet:
-                    net_income = float(income_statement["annualReports"][0].get("netIncome", 0))
-                    equity = float(balance_sheet["annualReports"][0].get("totalShareholderEquity", 0))
-                    if equity > 0:
-                        roe = (net_income / equity) * 100
-                        result_text += f"Return on Equity (ROE): {roe:.2f}%\n"
-            except:
-                pass
-        
-        # ROA (Return on Assets)
-        if "ReturnOnAssetsTTM" in overview:
-            try:
-                roa = float(overview["ReturnOnAssetsTTM"]) * 100
-                result_text += f"Return on Assets (ROA): {roa:.2f}%\n"
-            except:
-                result_text += f"Return on Assets (ROA): {overview.get('ReturnOnAssetsTTM', 'N/A')}\n"
-        else:
-            # Calculate ROA manually
-            try:
-                if income_statement and balance_sheet and "annualReports" in income_statement and "annualReports" in balance_sheet:
-                    net_income = float(income_statement["annualReports"][0].get("netIncome", 0))
-                    assets = float(balance_sheet["annualReports"][0].get("totalAssets", 0))
-                    if assets > 0:
-                        roa = (net_income / assets) * 100
-                        result_text += f"Return on Assets (ROA): {roa:.2f}%\n"
-            except:
-                pass
-        
-        # Profit Margin
-        if "ProfitMargin" in overview:
-            try:
-                profit_margin = float(overview["ProfitMargin"]) * 100
-                result_text += f"Profit Margin: {profit_margin:.2f}%\n"
-            except:
-                result_text += f"Profit Margin: {overview.get('ProfitMargin', 'N/A')}\n"
-        
-        # Operating Margin
-        if "OperatingMarginTTM" in overview:
-            try:
-                operating_margin = float(overview["OperatingMarginTTM"]) * 100
-                result_text += f"Operating Margin: {operating_margin:.2f}%\n"
-            except:
-                result_text += f"Operating Margin: {overview.get('OperatingMarginTTM', 'N/A')}\n"
-        
-        # Liquidity & Solvency Ratios
-        result_text += "\nLiquidity & Solvency Ratios:\n"
+            peg_ratio = float(overview["PEGRatio"])
+            result_text += f"PEG Ratio: {peg_ratio:.2f}\n"
+        except FIELD_ERRORS:
+            result_text += f"PEG Ratio: {overview.get('PEGRatio', 'N/A')}\n"
+    
+    # P/B Ratio (Price to Book)
+    try:
+        market_cap = float(overview.get("MarketCapitalization", 0))
+        book_value = float(overview.get("BookValue", 0)) * float(overview.get("SharesOutstanding", 0))
+        if market_cap > 0 and book_value > 0:
+            pb_ratio = market_cap / book_value
+            result_text += f"P/B Ratio: {pb_ratio:.2f}\n"
+    except FIELD_ERRORS:
+        # If we can't calculate it, use the overview data if available
+        if "PriceToBookRatio" in overview:
+            result_text += f"P/B Ratio: {overview['PriceToBookRatio']}\n"
+    
+    # Calculate P/S (Price to Sales) Ratio
+    try:
+        market_cap = float(overview.get("MarketCapitalization", 0))
+        revenue = 0
+        if income_statement and "annualReports" in income_statement and income_statement["annualReports"]:
+            revenue = float(income_statement["annualReports"][0].get("totalRevenue", 0))
         
-        # Current Ratio
+        if market_cap > 0 and revenue > 0:
+            ps_ratio = market_cap / revenue
+            result_text += f"P/S Ratio: {ps_ratio:.2f}\n"
+    except FIELD_ERRORS:
+        # If we can't calculate it, use the overview data if available
+        if "PriceToSalesRatioTTM" in overview:
+            result_text += f"P/S Ratio: {overview['PriceToSalesRatioTTM']}\n"
+    
+    # Dividend Yield
+    if "DividendYield" in overview:
         try:
-            if balance_sheet and "annualReports" in balance_sheet and balance_sheet["annualReports"]:
-                current_assets = float(balance_sheet["annualReports"][0].get("totalCurrentAssets", 0))
-                current_liabilities = float(balance_sheet["annualReports"][0].get("totalCurrentLiabilities", 0))
-                if current_liabilities > 0:
-                    current_ratio = current_assets / current_liabilities
-                    result_text += f"Current Ratio: {current_ratio:.2f}\n"
-        except:
-            pass
-        
-        # Quick Ratio (Acid-Test Ratio)
+            dividend_yield = float(overview["DividendYield"]) * 100
+            result_text += f"Dividend Yield: {dividend_yield:.2f}%\n"
+        except FIELD_ERRORS:
+            result_text += f"Dividend Yield: {overview.get('DividendYield', 'N/A')}\n"
+    
+    # Profitability Ratios
+    result_text += "\nProfitability Ratios:\n"
+    
+    # ROE (Return on Equity)
+    if "ReturnOnEquityTTM" in overview:
         try:
-            if balance_sheet and "annualReports" in balance_sheet and balance_sheet["annualReports"]:
-                current_assets = float(balance_sheet["annualReports"][0].get("totalCurrentAssets", 0))
-                inventory = float(balance_sheet["annualReports"][0].get("inventory", 0))
-                current_liabilities = float(balance_sheet["annualReports"][0].get("totalCurrentLiabilities", 0))
-                if current_liabilities > 0:
-                    quick_ratio = (current_assets - inventory) / current_liabilities
-                    result_text += f"Quick Ratio: {quick_ratio:.2f}\n"
-        except:
-            pass
-        
-        # Debt-to-Equity Ratio
+            roe = float(overview["ReturnOnEquityTTM"]) * 100
+            result_text += f"Return on Equity (ROE): {roe:.2f}%\n"
+        except FIELD_ERRORS:
+            result_text += f"Return on Equity (ROE): {overview.get('ReturnOnEquityTTM', 'N/A')}\n"
+    else:
+        # Calculate ROE manually
         try:
-            if balance_sheet and "annualReports" in balance_sheet and balance_sheet["annualReports"]:
-                total_debt = float(balance_sheet["annualReports"][0].get("shortLongTermDebtTotal", 0))
+            if income_statement and balance_sheet and "annualReports" in income_statement and "annualReports" in balance_sheet:
+                net_income = float(income_statement["annualReports"][0].get("netIncome", 0))
                 equity = float(balance_sheet["annualReports"][0].get("totalShareholderEquity", 0))
                 if equity > 0:
-                    debt_equity_ratio = total_debt / equity
-                    result_text += f"Debt-to-Equity Ratio: {debt_equity_ratio:.2f}\n"
-        except:
+                    roe = (net_income / equity) * 100
+                    result_text += f"Return on Equity (ROE): {roe:.2f}%\n"
+        except FIELD_ERRORS:
             pass
-        
-        # Debt Ratio (Total Debt / Total Assets)
+    
+    # ROA (Return on Assets)
+    if "ReturnOnAssetsTTM" in overview:
         try:
-            if balance_sheet and "annualReports" in balance_sheet and balance_sheet["annualReports"]:
-                total_debt = float(balance_sheet["annualReports"][0].get("shortLongTermDebtTotal", 0))
-                total_assets = float(balance_sheet["annualReports"][0].get("totalAssets", 0))
-                if total_assets > 0:
-                    debt_ratio = total_debt / total_assets
-                    result_text += f"Debt Ratio: {debt_ratio:.2f}\n"
-        except:
-            pass
-        
-        # Efficiency/Activity Ratios
-        result_text += "\nEfficiency Ratios:\n"
-        
-        # Asset Turnover
+            roa = float(overview["ReturnOnAssetsTTM"]) * 100
+            result_text += f"Return on Assets (ROA): {roa:.2f}%\n"
+        except FIELD_ERRORS:
+            result_text += f"Return on Assets (ROA): {overview.get('ReturnOnAssetsTTM', 'N/A')}\n"
+    else:
+        # Calculate ROA manually
         try:
             if income_statement and balance_sheet and "annualReports" in income_statement and "annualReports" in balance_sheet:
-                revenue = float(income_statement["annualReports"][0].get("totalRevenue", 0))
+                net_income = float(income_statement["annualReports"][0].get("netIncome", 0))
                 assets = float(balance_sheet["annualReports"][0].get("totalAssets", 0))
                 if assets > 0:
-                    asset_turnover = revenue / assets
-                    result_text += f"Asset Turnover: {asset_turnover:.2f}\n"
-        except:
+                    roa = (net_income / assets) * 100
+                    result_text += f"Return on Assets (ROA): {roa:.2f}%\n"
+        except FIELD_ERRORS:
             pass
-        
-        # Inventory Turnover
+    
+    # Profit Margin
+    if "ProfitMargin" in overview:
         try:
-            if income_statement and balance_sheet and "annualReports" in income_statement and "annualReports" in balance_sheet:
-                cogs = float(income_statement["annualReports"][0].get("costofGoodsAndServicesSold", 0))
-                inventory = float(balance_sheet["annualReports"][0].get("inventory", 0))
-                if inventory > 0:
-                    inventory_turnover = cogs / inventory
-                    result_text += f"Inventory Turnover: {inventory_turnover:.2f}\n"
-        except:
-            pass
+            profit_margin = float(overview["ProfitMargin"]) * 100
+            result_text += f"Profit Margin: {profit_margin:.2f}%\n"
+        except FIELD_ERRORS:
+            result_text += f"Profit Margin: {overview.get('ProfitMargin', 'N/A')}\n"
     
-    except Exception as e:
-        error(f"Error calculating financial ratios for {symbol}: {str(e)}")
-        result_text += f"Error calculating financial ratios: {str(e)}\n"
+    # Operating Margin
+    if "OperatingMarginTTM" in overview:
+        try:
+            operating_margin = float(overview["OperatingMarginTTM"]) * 100
+            result_text += f"Operating Margin: {operating_margin:.2f}%\n"
+        except FIELD_ERRORS:
+            result_text += f"Operating Margin: {overview.get('OperatingMarginTTM', 'N/A')}\n"
+    
+    # Liquidity & Solvency Ratios
+    result_text += "\nLiquidity & Solvency Ratios:\n"
+    
+    # Current Ratio
+    try:
+        if balance_sheet and "annualReports" in balance_sheet and balance_sheet["annualReports"]:
+            current_assets = float(balance_sheet["annualReports"][0].get("totalCurrentAssets", 0))
+            current_liabilities = float(balance_sheet["annualReports"][0].get("totalCurrentLiabilities", 0))
+            if current_liabilities > 0:
+                current_ratio = current_assets / current_liabilities
+                result_text += f"Current Ratio: {current_ratio:.2f}\n"
+    except FIELD_ERRORS:
+        pass
+    
+    # Quick Ratio (Acid-Test Ratio)
+    try:
+        if balance_sheet and "annualReports" in balance_sheet and balance_sheet["annualReports"]:
+            current_assets = float(balance_sheet["annualReports"][0].get("totalCurrentAssets", 0))
+            inventory = float(balance_sheet["annualReports"][0].get("inventory", 0))
+            current_liabilities = float(balance_sheet["annualReports"][0].get("totalCurrentLiabilities", 0))
+            if current_liabilities > 0:
+                quick_ratio = (current_assets - inventory) / current_liabilities
+                result_text += f"Quick Ratio: {quick_ratio:.2f}\n"
+    except FIELD_ERRORS:
+        pass
+    
+    # Debt-to-Equity Ratio
+    try:
+        if balance_sheet and "annualReports" in balance_sheet and balance_sheet["annualReports"]:
+            total_debt = float(balance_sheet["annualReports"][0].get("shortLongTermDebtTotal", 0))
+            equity = float(balance_sheet["annualReports"][0].get("totalShareholderEquity", 0))
+            if equity > 0:
+                debt_equity_ratio = total_debt / equity
+                result_text += f"Debt-to-Equity Ratio: {debt_equity_ratio:.2f}\n"
+    except FIELD_ERRORS:
+        pass
+    
+    # Debt Ratio (Total Debt / Total Assets)
+    try:
+        if balance_sheet and "annualReports" in balance_sheet and balance_sheet["annualReports"]:
+            total_debt = float(balance_sheet["annualReports"][0].get("shortLongTermDebtTotal", 0))
+            total_assets = float(balance_sheet["annualReports"][0].get("totalAssets", 0))
+            if total_assets > 0:
+                debt_ratio = total_debt / total_assets
+                result_text += f"Debt Ratio: {debt_ratio:.2f}\n"
+    except FIELD_ERRORS:
+        pass
+    
+    # Efficiency/Activity Ratios
+    result_text += "\nEfficiency Ratios:\n"
+    
+    # Asset Turnover
+    try:
+        if income_statement and balance_sheet and "annualReports" in income_statement and "annualReports" in balance_sheet:
+            revenue = float(income_statement["annualReports"][0].get("totalRevenue", 0))
+            assets = float(balance_sheet["annualReports"][0].get("totalAssets", 0))
+            if assets > 0:
+                asset_turnover = revenue / assets
+                result_text += f"Asset Turnover: {asset_turnover:.2f}\n"
+    except FIELD_ERRORS:
+        pass
+    
+    # Inventory Turnover
+    try:
+        if income_statement and balance_sheet and "annualReports" in income_statement and "annualReports" in balance_sheet:
+            cogs = float(income_statement["annualReports"][0].get("costofGoodsAndServicesSold", 0))
+            inventory = float(balance_sheet["annualReports"][0].get("inventory", 0))
+            if inventory > 0:
+                inventory_turnover = cogs / inventory
+                result_text += f"Inventory Turnover: {inventory_turnover:.2f}\n"
+    except FIELD_ERRORS:
+        pass
     
     # Add an analysis summary at the end
     result_text += f"\n{'=' * 50}\n"
@@ -492,10 +837,42 @@ def analyze_company(symbol, api_key=None):
     result_text += "Generated on: " + datetime.now().strftime("%Y-%m-%d %H:%M:%S") + "\n"
     
     info(f"Completed company analysis for {symbol}")
-    logger.log_tool_call("Company Analyzer", symbol, f"Analysis for {symbol} completed successfully")
+    log_tool_call("Company Analyzer", symbol, f"Analysis for {symbol} completed successfully")
     
     return result_text
 
+async def analyze_companies_async(symbols, api_key=None, refresh=False):
+    """
+    Analyze many companies at once over a single async HTTP client.
+    
+    Every data point for every symbol is requested concurrently, bounded by
+    ASYNC_MAX_CONNECTIONS, and each report is formatted in a worker thread.
+    
+    Args:
+        symbols: Company stock ticker symbols
+        api_key: Alpha Vantage API key (if None, will use environment variable)
+        refresh: Skip the response cache and fetch everything from the API
+        
+    Returns:
+        Dict mapping each symbol to its analysis text
+    """
+    api_key = _resolve_api_key(api_key)
+    limits = httpx.Limits(max_connections=ASYNC_MAX_CONNECTIONS, max_keepalive_connections=ASYNC_MAX_CONNECTIONS // 2)
+    timeout = httpx.Timeout(REQUEST_TIMEOUT[1], connect=REQUEST_TIMEOUT[0])
+    transport = httpx.AsyncHTTPTransport(retries=3, limits=limits)
+    
+    async with httpx.AsyncClient(transport=transport, timeout=timeout, headers={"User-Agent": "financial-research-agent"}) as client:
+        async def analyze(symbol):
+            info(f"Analyzing company data for: {symbol}")
+            results = await asyncio.gather(
+                *(fetch_data_point_async(client, symbol, data_point, api_key, refresh) for data_point in DATA_POINTS),
+                return_exceptions=True
+            )
+            return await asyncio.to_thread(format_analysis, symbol, results)
+        
+        reports = await asyncio.gather(*(analyze(symbol) for symbol in symbols))
+    return dict(zip(symbols, reports))
+
 # Define LangChain Tool
 company_analyzer_tool = Tool(
     name="Company Analyzer",
@@ -1,4 +1,5 @@
 import os
+import re
 import pandas as pd
 from dotenv import load_dotenv
 from langchain.agents import Tool
@@ -224,7 +225,6 @@ def startup_tool_router(query: str) -> str:
     # Check if it's asking for top startups
     if "top" in query and ("startup" in query or "companies" in query or "business" in query):
         # Extract number if specified
-        import re
         count_match = re.search(r'top\s+(\d+)', query)
         count = int(count_match.group(1)) if count_match else 10
         
@@ -13,7 +13,7 @@ client = OpenAI(
     api_key=os.environ.get("OPENAI_API_KEY")
 )
 
-def extract_visualizations(response_text, query, max_tables=5, max_graphs=3):
+def extract_visualizations(response_text, query, max_tables=5, max_graphs=3, include_tables=True, include_graphs=True):
     """
     Extract tables and graphs from a text response.
     
@@ -22,10 +22,19 @@ def extract_visualizations(response_text, query, max_tables=5, max_graphs=3):
         query (str): The original query that generated the response.
         max_tables (int): Maximum number of tables to extract.
         max_graphs (int): Maximum number of graphs to extract.
+        include_tables (bool): Whether tables are needed at all.
+        include_graphs (bool): Whether graphs are needed at all.
         
     Returns:
         dict: Dictionary containing tables and graphs.
     """
+    if not include_tables:
+        max_tables = 0
+    if not include_graphs:
+        max_graphs = 0
+    if max_tables <= 0 and max_graphs <= 0:
+        return {"tables": [], "graphs": []}
+    
     try:
         info(f"Extracting visualizations for query: {query[:100]}...")
         
@@ -35,6 +44,12 @@ def extract_visualizations(response_text, query, max_tables=5, max_graphs=3):
             query=query
         )
         
+        # Don't spend output tokens on the half the caller already has
+        if max_tables <= 0:
+            prompt += '\nOnly graphs are needed. Return an empty "tables" list.'
+        elif max_graphs <= 0:
+            prompt += '\nOnly tables are needed. Return an empty "graphs" list.'
+        
         # Query the OpenAI API
         response = client.chat.completions.create(
             model="gpt-4-turbo",